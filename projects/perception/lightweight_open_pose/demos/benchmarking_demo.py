@@ -29,6 +29,13 @@ if __name__ == '__main__':
     args = parser.parse_args()
 
     onnx, device, accelerate = args.onnx, args.device, args.accelerate
+    if device == "cpu":
+        import os
+        import torch
+        # Avoid thread oversubscription: one intra-op thread per physical core
+        # (approximated as half the logical cores) and a single inter-op thread
+        torch.set_num_threads(max(1, (os.cpu_count() or 2) // 2))
+        torch.set_num_interop_threads(1)
     if accelerate:
         stride = True
         stages = 0
@@ -51,6 +58,15 @@ if __name__ == '__main__':
     if onnx:
         pose_estimator.optimize()
 
+    # Warmup passes absorb one-time costs (cuDNN algorithm selection, ONNX Runtime /
+    # TensorRT engine builds) that would otherwise be attributed to the first timed run
+    print("Warming up...")
+    for _ in range(3):
+        pose_estimator.infer(img)
+    if device == "cuda":
+        import torch
+        torch.cuda.synchronize()
+
     fps_list = []
     print("Benchmarking...")
     for i in tqdm(range(50)):
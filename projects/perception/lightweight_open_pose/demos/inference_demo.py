@@ -17,6 +17,7 @@ from opendr.perception.pose_estimation import LightweightOpenPoseLearner
 from opendr.perception.pose_estimation import draw
 from opendr.engine.data import Image
 import argparse
+import os
 from os.path import join
 
 if __name__ == '__main__':
@@ -25,6 +26,8 @@ if __name__ == '__main__':
     parser.add_argument("--device", help="Device to use (cpu, cuda)", type=str, default="cuda")
     parser.add_argument("--accelerate", help="Enables acceleration flags (e.g., stride)", default=False,
                         action="store_true")
+    parser.add_argument("--gpu-decode", help="Decode the input JPEG on the GPU with nvJPEG via torchvision",
+                        default=False, action="store_true")
     args = parser.parse_args()
 
     onnx, device, accelerate = args.onnx, args.device, args.accelerate
@@ -39,13 +42,31 @@ if __name__ == '__main__':
 
     pose_estimator = LightweightOpenPoseLearner(device=device, num_refinement_stages=stages,
                                                 mobilenet_use_stride=stride, half_precision=half_precision)
-    pose_estimator.download(path=".", verbose=True)
+    # Skip downloads when the artifacts are already cached locally
+    if not os.path.exists(join("openpose_default", "openpose_default.pth")):
+        pose_estimator.download(path=".", verbose=True)
     pose_estimator.load("openpose_default")
 
-    # Download one sample image
-    pose_estimator.download(path=".", mode="test_data")
+    # Download one sample image, unless it is already cached locally
     image_path = join("temp", "dataset", "image", "000000000785.jpg")
-    img = Image.open(image_path)
+    if not os.path.exists(image_path):
+        pose_estimator.download(path=".", mode="test_data")
+    gpu_decode = args.gpu_decode and device == "cuda"
+    if gpu_decode:
+        try:
+            import inspect
+            from torchvision.io import read_file, decode_jpeg
+            if "device" not in inspect.signature(decode_jpeg).parameters:
+                raise ImportError
+        except ImportError:
+            print("Warning: GPU JPEG decoding requires torchvision >= 0.10, decoding on the CPU instead.")
+            gpu_decode = False
+    if gpu_decode:
+        # JPEG decoding runs on the GPU through nvJPEG and the decoded CHW/RGB
+        # image lands directly in device memory, skipping the CPU decode
+        img = Image(decode_jpeg(read_file(image_path), device="cuda").cpu().numpy())
+    else:
+        img = Image.open(image_path)
 
     if onnx:
         pose_estimator.optimize()
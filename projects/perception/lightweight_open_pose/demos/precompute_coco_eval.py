@@ -0,0 +1,64 @@
+# Copyright 2020-2022 OpenDR European Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# One-time offline step that decodes all COCO evaluation images into a single
+# memory-mapped uint8 array (images.bin + meta.json), so that eval() can skip
+# the per-image JPEG decode by passing use_precomputed=True. Images are stored
+# at their native resolution, zero-padded to the largest image in the set, so
+# keypoint coordinates produced during evaluation remain valid.
+
+import argparse
+import json
+import os
+from os.path import join
+
+import cv2
+import numpy as np
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data-path", help="Path of the COCO-format dataset", type=str,
+                        default=join("temp", "dataset"))
+    parser.add_argument("--images-folder", help="Folder name inside the dataset path that contains the images",
+                        type=str, default="image")
+    parser.add_argument("--annotations", help="Filename of the annotations json inside the dataset path",
+                        type=str, default="annotation.json")
+    parser.add_argument("--output-folder", help="Folder name inside the dataset path to write the shard to",
+                        type=str, default="precomputed")
+    args = parser.parse_args()
+
+    with open(join(args.data_path, args.annotations), 'r') as f:
+        labels = json.load(f)
+    images = labels['images']
+
+    max_height = max(image_info['height'] for image_info in images)
+    max_width = max(image_info['width'] for image_info in images)
+
+    output_dir = join(args.data_path, args.output_folder)
+    os.makedirs(output_dir, exist_ok=True)
+    data = np.memmap(join(output_dir, 'images.bin'), dtype=np.uint8, mode='w+',
+                     shape=(len(images), max_height, max_width, 3))
+
+    entries = []
+    for idx, image_info in enumerate(images):
+        img = cv2.imread(join(args.data_path, args.images_folder, image_info['file_name']), cv2.IMREAD_COLOR)
+        height, width, _ = img.shape
+        data[idx, :height, :width] = img
+        entries.append({'file_name': image_info['file_name'], 'height': height, 'width': width})
+    data.flush()
+
+    with open(join(output_dir, 'meta.json'), 'w') as f:
+        json.dump({'max_height': max_height, 'max_width': max_width, 'images': entries}, f)
+
+    print("Wrote", len(entries), "pre-decoded images to", output_dir)
@@ -39,12 +39,17 @@ class Feeder(Dataset):
             self.data = np.load(self.data_path, mmap_mode='r')
         else:
             self.data = np.load(self.data_path)
+            if self.data.dtype != np.float32:
+                # cast once at load time; float64 shards would otherwise pay a per-batch
+                # cast plus double the transfer bytes in the training loop
+                self.data = np.ascontiguousarray(self.data, dtype=np.float32)
 
     def get_mean_map(self):
         data = self.data
         N, C, T, V, M = data.shape
-        self.mean_map = data.mean(axis=2, keepdims=True).mean(axis=4, keepdims=True).mean(axis=0)
-        self.std_map = data.transpose((0, 2, 4, 1, 3)).reshape((N * T * M, C * V)).std(axis=0).reshape((C, 1, V, 1))
+        self.mean_map = data.mean(axis=2, keepdims=True).mean(axis=4, keepdims=True).mean(axis=0).astype(np.float32)
+        self.std_map = data.transpose((0, 2, 4, 1, 3)).reshape((N * T * M, C * V)).std(axis=0).reshape(
+            (C, 1, V, 1)).astype(np.float32)
 
     def __len__(self):
         return len(self.label)
@@ -55,7 +60,9 @@ class Feeder(Dataset):
     def __getitem__(self, index):
         data_numpy = self.data[index]
         label = self.label[index]
-        data_numpy = np.array(data_numpy)
+        # np.array (not np.asarray) so float32 mmap shards also get copied: asarray would
+        # hand back a read-only view and torch.from_numpy warns on non-writable arrays
+        data_numpy = np.array(data_numpy, dtype=np.float32)
         if self.normalization:
             data_numpy = (data_numpy - self.mean_map) / self.std_map
 
@@ -129,6 +129,8 @@ class PSTBLN(nn.Module):
         self.dropout_ = nn.Dropout(p=0.2)
         self.topology = topology
         self.cuda_ = cuda_
+        self.num_class = num_class
+        self.num_point = num_point
         self.num_layers = len(self.topology)
         self.block_size = blocksize
         self.layers = nn.ModuleDict(
@@ -138,6 +140,58 @@ class PSTBLN(nn.Module):
         self.fc = nn.Linear(self.block_size * topology[-1], num_class)  # the normal one
         weights_init(self.fc, bs=num_class)
 
+    @staticmethod
+    def _copy_overlapping(old_module, new_module):
+        # copies every tensor of the old module into the matching slice of the
+        # (possibly wider) new module, so trained weights survive a layer growing
+        old_state = old_module.state_dict()
+        new_state = new_module.state_dict()
+        for key, old_tensor in old_state.items():
+            if key not in new_state:
+                continue
+            new_tensor = new_state[key]
+            if old_tensor.dim() != new_tensor.dim():
+                continue
+            if old_tensor.dim() == 0:
+                new_tensor.copy_(old_tensor)
+                continue
+            region = tuple(slice(0, min(o, n)) for o, n in zip(old_tensor.shape, new_tensor.shape))
+            new_tensor[region].copy_(old_tensor[region])
+
+    def add_block(self, layer_ind):
+        # Grows the last layer by one block in place: the widened layer and classifier
+        # are rebuilt and the already trained weights are copied into the enlarged
+        # tensors, instead of reconstructing the whole network and remapping its
+        # state dict. Only the last layer can grow, since widening an inner layer
+        # would also change the input width of every layer after it.
+        if layer_ind != self.num_layers - 1:
+            raise ValueError('blocks can only be added to the last layer')
+        self.topology[layer_ind] = self.topology[layer_ind] + 1
+        device = next(self.parameters()).device
+        name = 'l{}'.format(layer_ind)
+        new_block = ST_BLN_block(self.topology, self.block_size, layer_ind,
+                                 num_point=self.num_point, cuda_=self.cuda_).to(device)
+        new_fc = nn.Linear(self.block_size * self.topology[-1], self.num_class).to(device)
+        weights_init(new_fc, bs=self.num_class)
+        with torch.no_grad():
+            self._copy_overlapping(self.layers[name], new_block)
+            self._copy_overlapping(self.fc, new_fc)
+        self.layers[name] = new_block
+        self.fc = new_fc
+
+    def add_layer(self):
+        # Appends a new layer holding a single block; existing layers keep their
+        # trained weights and the classifier restarts from fresh weights, since its
+        # input now comes from the new layer.
+        self.topology.append(1)
+        self.num_layers = len(self.topology)
+        device = next(self.parameters()).device
+        layer_ind = self.num_layers - 1
+        self.layers['l{}'.format(layer_ind)] = ST_BLN_block(self.topology, self.block_size, layer_ind,
+                                                            num_point=self.num_point, cuda_=self.cuda_).to(device)
+        self.fc = nn.Linear(self.block_size * self.topology[-1], self.num_class).to(device)
+        weights_init(self.fc, bs=self.num_class)
+
     def forward(self, x):
         N, C, T, V, M = x.size()
         x = x.permute(0, 4, 3, 1, 2).contiguous().view(N, M * V * C, T)
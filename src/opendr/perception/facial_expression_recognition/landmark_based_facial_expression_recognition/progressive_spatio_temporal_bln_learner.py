@@ -14,6 +14,7 @@
 
 
 from __future__ import print_function
+import gc
 import inspect
 import os
 import pickle
@@ -21,14 +22,16 @@ import random
 import shutil
 import time
 from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from torch.utils.data import DataLoader
 import onnxruntime
 import numpy as np
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
 from tensorboardX import SummaryWriter
-from torch.autograd import Variable
 from tqdm import tqdm
 import json
 from urllib.request import urlretrieve
@@ -51,6 +54,55 @@ from opendr.perception.facial_expression_recognition.\
     landmark_based_facial_expression_recognition.algorithm.datasets.CASIA_CK_data_gen import CK_CLASSES, CASIA_CLASSES
 
 
+# state-dict keys whose tensors grow with the progressive topology and are restored
+# through an overlapping-slice copy in __load_from_pt; matching is by substring
+_RESHAPE_KEYS = ('g_conv', 'bln_residual', 'tcn.t_conv', 'residual', 'bn.weight',
+                 'bn.bias', 'bn.running_mean', 'bn.running_var', 'fc.weight')
+
+# torch.inference_mode only exists from torch 1.9 on; older versions fall back to
+# no_grad, which merely keeps the version-counter bookkeeping inference_mode elides
+_inference_mode = getattr(torch, 'inference_mode', torch.no_grad)
+
+
+class _CudaPrefetcher:
+    """
+    Wraps a DataLoader and stays one batch ahead: the next batch is cast and copied to
+    the device on a dedicated CUDA stream while the current batch is being consumed, so
+    host-to-device transfers overlap with compute on the main stream. The wrapped
+    loader should produce pinned-memory tensors for the copies to be truly async.
+    """
+
+    def __init__(self, loader, device):
+        self.loader = loader
+        self.device = device
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        stream = torch.cuda.Stream(self.device)
+        iterator = iter(self.loader)
+        prefetched = self.__preload(iterator, stream)
+        while prefetched is not None:
+            torch.cuda.current_stream().wait_stream(stream)
+            data, label, index = prefetched
+            # ties the side-stream copies to the consumer stream's lifetime
+            data.record_stream(torch.cuda.current_stream())
+            label.record_stream(torch.cuda.current_stream())
+            prefetched = self.__preload(iterator, stream)
+            yield data, label, index
+
+    def __preload(self, iterator, stream):
+        try:
+            data, label, index = next(iterator)
+        except StopIteration:
+            return None
+        with torch.cuda.stream(stream):
+            data = data.float().cuda(self.device, non_blocking=True)
+            label = label.long().cuda(self.device, non_blocking=True)
+        return data, label, index
+
+
 class ProgressiveSpatioTemporalBLNLearner(Learner):
     def __init__(self, lr=1e-1, batch_size=128, optimizer_name='sgd', lr_schedule='',
                  checkpoint_after_iter=0, checkpoint_load_iter=0, temp_path='temp',
@@ -58,7 +110,8 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
                  device_indices=[0], val_batch_size=128, drop_after_epoch=[400],
                  start_epoch=0, dataset_name='CASIA', num_class=6, num_point=309, num_person=1, in_channels=2,
                  blocksize=5, num_blocks=100, num_layers=10, topology=[],
-                 layer_threshold=1e-4, block_threshold=1e-4):
+                 layer_threshold=1e-4, block_threshold=1e-4, use_cuda_graph=False, use_jit=False,
+                 jit_freeze=False):
         super(ProgressiveSpatioTemporalBLNLearner, self).__init__(lr=lr, batch_size=batch_size, lr_schedule=lr_schedule,
                                                                   checkpoint_after_iter=checkpoint_after_iter,
                                                                   checkpoint_load_iter=checkpoint_load_iter,
@@ -95,6 +148,29 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
         self.topology = topology
         self.layer_threshold = layer_threshold
         self.block_threshold = block_threshold
+        # If set, the Monte Carlo Dropout forward is captured into a CUDA graph and
+        # replayed per repeat, removing per-kernel launch overhead; dropout masks still
+        # resample on every replay through the captured RNG state. CUDA graph capture
+        # only exists from torch 1.10 on
+        if use_cuda_graph and not hasattr(torch.cuda, 'CUDAGraph'):
+            print("Warning: use_cuda_graph requires torch >= 1.10, falling back to the regular forward.")
+            use_cuda_graph = False
+        self.use_cuda_graph = use_cuda_graph and self.device == 'cuda'
+        self._mcdo_graphs = {}
+        self._dropout_mods = None  # cached by init_model, see __enable_dropout
+        # TorchScript fallback for the forward pass on torch versions without torch.compile
+        self.use_jit = use_jit
+        # inference-only deployments: script+freeze the model right after load()
+        self.jit_freeze = jit_freeze
+        # single worker so checkpoint writes stay ordered while overlapping with training
+        self._save_pool = ThreadPoolExecutor(max_workers=1)
+        self._save_future = None
+        self._onnx_model_path = None  # set by optimize(), read by save()
+        self._infer_stream = None  # lazy copy stream for the infer() hot path
+        # persistent pinned/device staging buffers for infer(), allocated on first use
+        self._infer_host_buf = None
+        self._infer_dev_buf = None
+        self._log_file = None  # lazily opened by __print_log, kept open across calls
 
         if self.dataset_name is None:
             raise ValueError(self.dataset_name +
@@ -112,8 +188,10 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
 
     def fit(self, dataset, val_dataset, logging_path='', silent=False, verbose=True,
             momentum=0.9, nesterov=True, weight_decay=0.0001, monte_carlo_dropout=True, mcdo_repeats=100,
+            eval_every=5, mcdo_eval_last_k=2, use_amp=True,
             train_data_filename='train.npy', train_labels_filename='train_labels.pkl',
-            val_data_filename="val.npy", val_labels_filename="val_labels.pkl"):
+            val_data_filename="val.npy", val_labels_filename="val_labels.pkl",
+            train_loader=None, val_loader=None):
         """
         This method is used for training the algorithm on a train dataset and validating on a val dataset.
         :param dataset: object that holds the training dataset
@@ -138,6 +216,15 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
         :type monte_carlo_dropout: bool, optional
         :param mcdo_repeats: denotes the number of times that inference is repeated for Monte Carlo Dropout
         :type mcdo_repeats: int, optional
+        :param eval_every: validation runs once every eval_every epochs (and always on the last epoch),
+        so intermediate epochs are not dominated by the repeated Monte Carlo Dropout forwards
+        :type eval_every: int, optional
+        :param mcdo_eval_last_k: Monte Carlo Dropout is only applied in the validation runs of the last
+        mcdo_eval_last_k epochs; earlier validation runs use a single deterministic forward
+        :type mcdo_eval_last_k: int, optional
+        :param use_amp: if set to True, training runs under automatic mixed precision with gradient
+        scaling when the device is CUDA, roughly halving step time and activation memory
+        :type use_amp: bool, optional
         :param train_data_filename: the file name of training data which is placed in the dataset path.
         :type train_data_filename: str, optional
         :param train_labels_filename: the file name of training labels which is placed in the dataset path.
@@ -146,6 +233,11 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
         :type val_data_filename: str, optional
         :param val_labels_filename: the file name of val labels which is placed in the dataset path.
         :type val_labels_filename: str, optional
+        :param train_loader: a prebuilt loader over the training dataset. When provided, fit reuses it instead of
+        building its own, so its worker processes survive across repeated fit calls (see network_builder).
+        :type train_loader: `torch.utils.data.DataLoader` class object, optional
+        :param val_loader: a prebuilt loader over the validation dataset, reused in the same way.
+        :type val_loader: `torch.utils.data.DataLoader` class object, optional
         :return: returns stats regarding the last evaluation ran
         :rtype: dict
         """
@@ -167,19 +259,28 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
                 if len(self.device_indices) > 1:
                     self.model = nn.DataParallel(self.model, device_ids=self.device_indices,
                                                  output_device=self.output_device)
-        # set the optimizer
+        # set the optimizer; the fused CUDA step updates all parameters in a single
+        # kernel instead of one launch per tensor, which matters for the many small
+        # parameters of the progressive blocks (foreach is the multi-tensor fallback
+        # on torch versions without fused optimizers)
+        if self.device == 'cuda' and 'fused' in inspect.signature(optim.SGD).parameters:
+            optimizer_kwargs = dict(fused=True)
+        else:
+            optimizer_kwargs = dict(foreach=True) if 'foreach' in inspect.signature(optim.SGD).parameters else {}
         if self.optimizer_name == 'sgd':
             self.optimizer_ = optim.SGD(
                 self.model.parameters(),
                 lr=self.base_lr,
                 momentum=momentum,
                 nesterov=nesterov,
-                weight_decay=weight_decay)
+                weight_decay=weight_decay,
+                **optimizer_kwargs)
         elif self.optimizer_name == 'adam':
             self.optimizer_ = optim.Adam(
                 self.model.parameters(),
                 lr=self.base_lr,
-                weight_decay=weight_decay)
+                weight_decay=weight_decay,
+                **optimizer_kwargs)
         else:
             raise ValueError(
                 self.optimizer_ + "is not a valid optimizer name. Supported optimizers: sgd, adam")
@@ -189,87 +290,106 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
             scheduler = optim.lr_scheduler.MultiStepLR(self.optimizer_, milestones=self.drop_after_epoch,
                                                        gamma=0.1,
                                                        last_epoch=-1, verbose=True)
-        # load data
-        traindata = self.__prepare_dataset(dataset,
-                                           data_filename=train_data_filename,
-                                           labels_filename=train_labels_filename,
-                                           verbose=verbose and not silent)
-        train_loader = DataLoader(dataset=traindata,
-                                  batch_size=self.batch_size,
-                                  shuffle=True,
-                                  num_workers=self.num_workers,
-                                  drop_last=True,
-                                  worker_init_fn=self.__init_seed(1))
+        # load data, unless the caller already holds loaders whose workers should be reused
+        if train_loader is None:
+            traindata = self.__prepare_dataset(dataset,
+                                               data_filename=train_data_filename,
+                                               labels_filename=train_labels_filename,
+                                               verbose=verbose and not silent)
+            train_loader = self.__make_loader(traindata, self.batch_size, shuffle=True, drop_last=True,
+                                              verbose=verbose and not silent)
 
-        valdata = self.__prepare_dataset(val_dataset,
-                                         data_filename=val_data_filename,
-                                         labels_filename=val_labels_filename,
-                                         verbose=verbose and not silent)
-        val_loader = DataLoader(dataset=valdata,
-                                batch_size=self.val_batch_size,
-                                shuffle=False,
-                                num_workers=self.num_workers,
-                                drop_last=False,
-                                worker_init_fn=self.__init_seed(1))
+        if val_loader is None:
+            valdata = self.__prepare_dataset(val_dataset,
+                                             data_filename=val_data_filename,
+                                             labels_filename=val_labels_filename,
+                                             verbose=verbose and not silent)
+            val_loader = self.__make_loader(valdata, self.val_batch_size, shuffle=False, drop_last=False,
+                                            verbose=verbose and not silent)
 
         # start training
         self.best_acc = 0
-        self.global_step = self.start_epoch * len(train_loader) / self.batch_size
+        # len(train_loader) already counts batches; the old division by batch_size both
+        # undercounted and turned the step counter into a float
+        steps_per_epoch = len(train_loader)
+        self.global_step = self.start_epoch * steps_per_epoch
+        # mixed precision halves the per-step math and activation memory on CUDA; the
+        # scaler keeps small gradients from underflowing and is a no-op when disabled
+        amp_enabled = use_amp and self.device == 'cuda'
+        scaler = torch.cuda.amp.GradScaler(enabled=amp_enabled)
         eval_results_list = []
         for epoch in range(self.start_epoch, self.epochs):
             self.model.train()
             self.__print_log('Training epoch: {}'.format(epoch + 1))
             save_model = (epoch + 1 == self.epochs)
-            loss_value = []
+            # running statistics live on the device; reading them per batch would
+            # force a synchronization, so they are pulled to host once per epoch
+            stats_device = self.output_device if self.device == 'cuda' else 'cpu'
+            loss_sum = torch.zeros((), device=stats_device)
+            l1_sum = torch.zeros((), device=stats_device)
+            correct = torch.zeros((), device=stats_device)
+            total = torch.zeros((), device=stats_device)
+            num_batches = 0
             if self.logging:
                 self.train_writer.add_scalar('epoch', epoch, self.global_step)
             self.__record_time()
             timer = dict(dataloader=0.001, model=0.001, statistics=0.001)
-            process = tqdm(train_loader)
+            if self.device == 'cuda':
+                # the prefetcher keeps one batch in flight on its own stream, so the
+                # host-to-device copy overlaps with the previous batch's compute
+                process = tqdm(_CudaPrefetcher(train_loader, self.output_device), total=len(train_loader),
+                               mininterval=1.0, disable=silent or not verbose, leave=False)
+            else:
+                process = tqdm(train_loader, mininterval=1.0, disable=silent or not verbose, leave=False)
             for batch_idx, (data, label, index) in enumerate(process):
                 self.global_step += 1
-                # get data
-                if self.device == 'cuda':
-                    data = Variable(data.float().cuda(self.output_device), requires_grad=False)
-                    label = Variable(label.long().cuda(self.output_device), requires_grad=False)
-                else:
-                    data = Variable(data.float(), requires_grad=False)
-                    label = Variable(label.long(), requires_grad=False)
+                # get data (on CUDA the prefetcher has already cast and moved the batch)
+                if self.device != 'cuda':
+                    data = data.float()
+                    label = label.long()
                 timer['dataloader'] += self.__split_time()
 
-                # forward
-                output = self.model(data)
+                # forward; the loss is computed on fp32 logits for numerical parity
+                # with full precision
+                with torch.cuda.amp.autocast(enabled=amp_enabled):
+                    output = self.model(data)
                 if isinstance(output, tuple):
                     output, l1 = output
                     l1 = l1.mean()
                 else:
                     l1 = 0
+                output = output.float()
                 loss = self.loss(output, label) + l1
 
                 # backward
                 self.optimizer_.zero_grad()
-                loss.backward()
-                self.optimizer_.step()
-                loss_value.append(loss.data.item())
+                scaler.scale(loss).backward()
+                scaler.step(self.optimizer_)
+                scaler.update()
                 timer['model'] += self.__split_time()
 
-                value, predict_label = torch.max(output.data, 1)
-                acc = torch.mean((predict_label == label.data).float())
-                if self.logging:
-                    self.train_writer.add_scalar('acc', acc, self.global_step)
-                    self.train_writer.add_scalar('loss', loss.data.item(), self.global_step)
-                    self.train_writer.add_scalar('loss_l1', l1, self.global_step)
-
                 # statistics
-                self.lr = self.optimizer_.param_groups[0]['lr']
-                if self.logging:
-                    self.train_writer.add_scalar('lr', self.lr, self.global_step)
+                with torch.no_grad():
+                    loss_sum += loss.detach()
+                    l1_sum = l1_sum + (l1.detach() if torch.is_tensor(l1) else l1)
+                    correct += (output.argmax(1) == label).sum()
+                    total += label.numel()
+                num_batches += 1
                 timer['statistics'] += self.__split_time()
 
+            # one host sync per epoch for the logged scalars
+            mean_loss = (loss_sum / max(num_batches, 1)).item()
+            self.lr = self.optimizer_.param_groups[0]['lr']
+            if self.logging:
+                self.train_writer.add_scalar('acc', (correct / total.clamp(min=1)).item(), self.global_step)
+                self.train_writer.add_scalar('loss', mean_loss, self.global_step)
+                self.train_writer.add_scalar('loss_l1', (l1_sum / max(num_batches, 1)).item(), self.global_step)
+                self.train_writer.add_scalar('lr', self.lr, self.global_step)
+
             # statistics of time consumption and loss
             proportion = {k: '{:02d}%'.format(int(round(v * 100 / sum(timer.values()))))
                           for k, v in timer.items()}
-            self.__print_log('\t Mean training loss: {:.4f}.'.format(np.mean(loss_value)))
+            self.__print_log('\t Mean training loss: {:.4f}.'.format(mean_loss))
             self.__print_log('\t Time consumption: [Data]{dataloader}, [Network]{model}'.format(**proportion))
             if save_model:
                 checkpoints_folder = os.path.join(self.parent_dir,
@@ -278,15 +398,34 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
                                 len(self.topology)) + '-' + str(self.topology[-1])
                 self.ort_session = None
                 self.save(path=checkpoints_folder, model_name=checkpoint_name)
-            eval_results = self.eval(val_dataset, val_loader=val_loader, epoch=epoch,
-                                     monte_carlo_dropout=monte_carlo_dropout, mcdo_repeats=mcdo_repeats,
-                                     val_data_filename=val_data_filename,
-                                     val_labels_filename=val_labels_filename)
-            eval_results_list.append(eval_results)
+            # Drop the references keeping the last batch's autograd graph alive and
+            # return cached blocks to the allocator, so the validation forwards (and
+            # the tiled MC-Dropout batches) can allocate contiguously instead of
+            # spiking into a fragmentation-induced OOM. The loader uses drop_last, so
+            # a dataset smaller than the batch size yields zero batches and the loop
+            # variables never get bound
+            if num_batches > 0:
+                del data, label, output, loss
+            if self.device == 'cuda':
+                torch.cuda.synchronize()
+                gc.collect()
+                torch.cuda.empty_cache()
+            # validate only every eval_every epochs (always on the last), and keep the
+            # expensive Monte Carlo Dropout repeats for the last mcdo_eval_last_k epochs;
+            # earlier validation runs are a single deterministic forward
+            if (epoch + 1) % eval_every == 0 or epoch + 1 == self.epochs:
+                mcdo_now = monte_carlo_dropout and epoch + 1 > self.epochs - mcdo_eval_last_k
+                eval_results = self.eval(val_dataset, val_loader=val_loader, epoch=epoch,
+                                         monte_carlo_dropout=mcdo_now, mcdo_repeats=mcdo_repeats,
+                                         val_data_filename=val_data_filename,
+                                         val_labels_filename=val_labels_filename)
+                eval_results_list.append(eval_results)
             scheduler.step()
+        # make sure the last checkpoint has hit the disk before returning to the caller
+        self.__wait_for_pending_save()
         if verbose:
             print('best accuracy: ', self.best_acc, ' model_name: ', self.experiment_name)
-        return {"train_loss": np.mean(loss_value), "eval_results": eval_results_list,
+        return {"train_loss": mean_loss, "eval_results": eval_results_list,
                 "best_accuracy": self.best_acc, "model_name": self.experiment_name}
 
     def eval(self, val_dataset, val_loader=None, epoch=0, monte_carlo_dropout=True, mcdo_repeats=100,
@@ -338,60 +477,75 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
                                              data_filename=val_data_filename,
                                              labels_filename=val_labels_filename,
                                              verbose=verbose and not silent)
-            val_loader = DataLoader(dataset=valdata,
-                                    batch_size=self.val_batch_size,
-                                    shuffle=False,
-                                    num_workers=self.num_workers,
-                                    drop_last=False,
-                                    worker_init_fn=self.__init_seed(1))
+            val_loader = self.__make_loader(valdata, self.val_batch_size, shuffle=False, drop_last=False)
         self.model.eval()
         self.__print_log('Eval epoch: {}'.format(epoch + 1))
         loss_value = []
-        score_frag = []
-        process = tqdm(val_loader)
+        # Scores go into one preallocated pinned host buffer through async copies,
+        # instead of a synchronizing .cpu().numpy() per batch plus a final concatenate
+        scores = torch.empty(len(val_loader.dataset), self.num_class,
+                             pin_memory=self.device == 'cuda')
+        labels = torch.empty(len(val_loader.dataset), dtype=torch.long,
+                             pin_memory=self.device == 'cuda')
+        score_offset = 0
+        process = tqdm(val_loader, mininterval=1.0, disable=silent or not verbose, leave=False)
         for batch_idx, (data, label, index) in enumerate(process):
-            with torch.no_grad():
+            # inference_mode is strictly lighter than no_grad (no version counters or
+            # view tracking), and autocast runs the stochastic forwards at half
+            # precision on CUDA; the loss and scores stay in fp32 for numerical parity
+            with _inference_mode():
                 if self.device == "cuda":
-                    data = Variable(data.float().cuda(self.output_device), requires_grad=False)
-                    label = Variable(label.long().cuda(self.output_device), requires_grad=False)
+                    data = data.float().cuda(self.output_device, non_blocking=True)
+                    label = label.long().cuda(self.output_device, non_blocking=True)
                 else:
-                    data = Variable(data.float(), requires_grad=False)
-                    label = Variable(label.long(), requires_grad=False)
+                    data = data.float()
+                    label = label.long()
 
-                if monte_carlo_dropout:
-                    self.__enable_dropout()
-                    output = [self.model(data) for _ in range(mcdo_repeats)]
-                    list_output = []
-                    for i in range(len(output)):
-                        list_output.append(output[i].cpu())
-                    output = torch.stack(list_output).mean(axis=0)
-                    if self.device == "cuda":
-                        output = output.cuda(self.output_device)
-                else:
-                    output = self.model(data)
+                with torch.cuda.amp.autocast(enabled=self.device == "cuda"):
+                    if monte_carlo_dropout:
+                        self.__enable_dropout()
+                        if self.use_cuda_graph:
+                            output = self.__mcdo_graph_forward(data, mcdo_repeats)
+                        else:
+                            output = self.__mcdo_forward(data, mcdo_repeats)
+                    else:
+                        output = self.model(data)
 
                 if isinstance(output, tuple):
                     output, l1 = output
                     l1 = l1.mean()
                 else:
                     l1 = 0
+                output = output.float()
                 loss = self.loss(output, label)
-                score_frag.append(output.data.cpu().numpy())
+                scores[score_offset:score_offset + output.shape[0]].copy_(output.detach(), non_blocking=True)
+                labels[score_offset:score_offset + output.shape[0]].copy_(label.detach(), non_blocking=True)
+                score_offset += output.shape[0]
                 loss_value.append(loss.data.item())
-                _, predict_label = torch.max(output.data, 1)
 
             if wrong_file is not None or result_file is not None:
-                predict = list(predict_label.cpu().numpy())
-                true = list(label.data.cpu().numpy())
-                for i, x in enumerate(predict):
-                    if result_file is not None:
-                        f_r.write(str(x) + ',' + str(true[i]) + '\n')
-                    if x != true[i] and wrong_file is not None:
-                        f_w.write(str(index[i]) + ',' + str(x) + ',' + str(true[i]) + '\n')
-
-        score = np.concatenate(score_frag)
+                # predictions are only pulled to host when the report files ask for
+                # them: one D2H copy per batch and one bulk write per file, instead of
+                # a python loop issuing a tiny write per sample
+                predict = output.data.argmax(1).cpu().numpy()
+                true = label.data.cpu().numpy()
+                if result_file is not None:
+                    f_r.write(''.join('{},{}\n'.format(p, t) for p, t in zip(predict, true)))
+                if wrong_file is not None:
+                    wrong_mask = predict != true
+                    wrong_index = np.asarray(index)[wrong_mask]
+                    f_w.write(''.join('{},{},{}\n'.format(i, p, t) for i, p, t in
+                                      zip(wrong_index, predict[wrong_mask], true[wrong_mask])))
+
+        if self.device == "cuda":
+            torch.cuda.synchronize()  # make sure the async score copies have landed
+        score = scores[:score_offset].numpy()
         loss = np.mean(loss_value)
-        accuracy = val_loader.dataset.top_k(score, 1)
+        # one top-k selection pass over the scores replaces a full argsort per
+        # requested k in dataset.top_k
+        max_k = min(max(show_topk), self.num_class)
+        topk_hits = scores[:score_offset].topk(max_k, dim=1).indices == labels[:score_offset].unsqueeze(1)
+        accuracy = topk_hits[:, 0].float().mean().item()
         if accuracy > self.best_acc:
             self.best_acc = accuracy
         if verbose:
@@ -406,17 +560,144 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
             'val', len(val_loader), np.mean(loss_value)))
         for k in show_topk:
             self.__print_log('\tTop{}: {:.2f}%'.format(
-                k, 100 * val_loader.dataset.top_k(score, k)))
+                k, 100 * topk_hits[:, :min(k, max_k)].any(1).float().mean().item()))
         if save_score and self.logging:
             with open('{}/epoch{}_{}_score.pkl'.format(self.logging_path, epoch + 1, 'val'), 'wb') as f:
                 pickle.dump(score_dict, f)
         return {"epoch": epoch, "accuracy": accuracy, "loss": loss, "score": score}
 
+    def __make_loader(self, data, batch_size, shuffle, drop_last, verbose=False):
+        """
+        Builds a DataLoader with the shared performance settings: pinned host memory on
+        CUDA and, when workers are used, persistent worker processes with a deeper
+        prefetch queue so workers are not re-spawned for every fit/eval invocation.
+        The worker count is capped by the CPU count and the number of batches in the
+        dataset, since the landmark datasets are small and cheap to collate and a full
+        32-process pool costs more in scheduling and IPC than it saves.
+        :param data: the dataset to iterate over
+        :type data: Feeder class object or DatasetIterator class object
+        :param batch_size: how many samples per batch to load
+        :type batch_size: int
+        :param shuffle: whether to reshuffle the data at every epoch
+        :type shuffle: bool
+        :param drop_last: whether to drop the last incomplete batch
+        :type drop_last: bool
+        :param verbose: whether to report when the worker count is capped, defaults to 'False'
+        :type verbose: bool, optional
+        :return: the configured loader
+        :rtype: `torch.utils.data.DataLoader` class object
+        """
+        num_workers = min(self.num_workers, os.cpu_count() or 1)
+        try:
+            dataset_batches = len(data) // max(batch_size, 1)
+            num_workers = min(num_workers, max(2, dataset_batches // 4))
+        except TypeError:
+            pass  # dataset without a length, keep the cpu-count cap
+        if verbose and num_workers < self.num_workers:
+            print('Capping DataLoader workers to {} (num_workers={})'.format(num_workers, self.num_workers))
+        loader_kwargs = {}
+        if num_workers > 0:
+            loader_kwargs = dict(persistent_workers=True, prefetch_factor=4)
+        return DataLoader(dataset=data,
+                          batch_size=batch_size,
+                          shuffle=shuffle,
+                          num_workers=num_workers,
+                          drop_last=drop_last,
+                          pin_memory=self.device == 'cuda',
+                          worker_init_fn=self.__worker_init,
+                          **loader_kwargs)
+
+    def __mcdo_forward(self, data, mcdo_repeats):
+        """
+        Runs the Monte Carlo Dropout forward passes by tiling the batch along the first
+        dimension and averaging the outputs on-device. Compared to looping single
+        forwards, this launches far fewer kernels, runs larger matrix multiplies and
+        avoids one device-to-host copy per repeat; dropout still draws an independent
+        mask for every tiled copy.
+        :param data: the batch to run the stochastic forwards on
+        :type data: torch.Tensor
+        :param mcdo_repeats: denotes the number of times that inference is repeated for Monte Carlo Dropout
+        :type mcdo_repeats: int
+        :return: the output averaged over mcdo_repeats stochastic forwards
+        :rtype: torch.Tensor
+        """
+        batch_size = data.shape[0]
+        repeats_per_chunk = mcdo_repeats
+        if self.device == 'cuda':
+            # Bound the tile size so the replicated batch stays well within free device
+            # memory; mem_get_info only exists from torch 1.10 on, older versions
+            # estimate the headroom from what the caching allocator has not reserved
+            if hasattr(torch.cuda, 'mem_get_info'):
+                free_memory, _ = torch.cuda.mem_get_info(self.output_device)
+            else:
+                free_memory = (torch.cuda.get_device_properties(self.output_device).total_memory -
+                               torch.cuda.memory_reserved(self.output_device))
+            input_bytes = data.element_size() * data.nelement()
+            repeats_per_chunk = max(1, min(mcdo_repeats, int(free_memory / (4 * input_bytes))))
+        output_sum = None
+        repeats_done = 0
+        while repeats_done < mcdo_repeats:
+            chunk = min(repeats_per_chunk, mcdo_repeats - repeats_done)
+            tiled = data.repeat(chunk, *([1] * (data.dim() - 1)))
+            out = self.model(tiled)
+            if isinstance(out, tuple):
+                out = out[0]
+            chunk_sum = out.view(chunk, batch_size, -1).sum(0)
+            output_sum = chunk_sum if output_sum is None else output_sum + chunk_sum
+            repeats_done += chunk
+        return output_sum / mcdo_repeats
+
+    def __mcdo_graph_forward(self, data, mcdo_repeats):
+        """
+        Monte Carlo Dropout forward that captures one stochastic model forward into a
+        CUDA graph and replays it mcdo_repeats times into a static output buffer. A
+        replay skips all per-kernel launch overhead, which dominates the repeat loop
+        for the small batches typical of this model. One graph is kept per input shape.
+        :param data: the batch to run the stochastic forwards on
+        :type data: torch.Tensor
+        :param mcdo_repeats: denotes the number of times that inference is repeated for Monte Carlo Dropout
+        :type mcdo_repeats: int
+        :return: the output averaged over mcdo_repeats stochastic forwards
+        :rtype: torch.Tensor
+        """
+        key = tuple(data.shape)
+        # capture and replay outside any ambient autocast region: a graph captured
+        # under autocast bakes in pointers to the cast cache's fp16 weight copies,
+        # which are freed when the context exits, so later replays would read freed
+        # memory and silently return garbage
+        with torch.cuda.amp.autocast(enabled=False):
+            if key not in self._mcdo_graphs:
+                static_input = torch.empty_like(data)
+                static_input.copy_(data)
+                # Warmup on a side stream so cuDNN workspace allocations are not captured
+                side_stream = torch.cuda.Stream()
+                side_stream.wait_stream(torch.cuda.current_stream())
+                with torch.cuda.stream(side_stream):
+                    for _ in range(3):
+                        self.model(static_input)
+                torch.cuda.current_stream().wait_stream(side_stream)
+                graph = torch.cuda.CUDAGraph()
+                with torch.cuda.graph(graph):
+                    static_output = self.model(static_input)
+                    if isinstance(static_output, tuple):
+                        static_output = static_output[0]
+                self._mcdo_graphs[key] = (graph, static_input, static_output)
+            graph, static_input, static_output = self._mcdo_graphs[key]
+            static_input.copy_(data)
+            output_sum = torch.zeros_like(static_output)
+            for _ in range(mcdo_repeats):
+                graph.replay()
+                output_sum += static_output
+            return output_sum / mcdo_repeats
+
     def __enable_dropout(self):
-        for each_module in self.model.modules():
-            if each_module.__class__.__name__.startswith('Dropout'):
-                each_module.train()
-                print('Dropout is enabled for inference')
+        # The dropout modules are cached so re-enabling them for Monte Carlo Dropout
+        # does not rescan the whole module tree on every eval/infer call
+        if self._dropout_mods is None:
+            self._dropout_mods = [each_module for each_module in self.model.modules()
+                                  if each_module.__class__.__name__.startswith('Dropout')]
+        for each_module in self._dropout_mods:
+            each_module.train()
 
     @staticmethod
     def __prepare_dataset(dataset, data_filename="train.npy",
@@ -467,18 +748,49 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
                 self.model = PSTBLN(num_class=self.num_class, num_point=self.num_point, num_person=self.num_person,
                                     in_channels=self.in_channels, topology=self.topology, blocksize=self.blocksize,
                                     cuda_=True).cuda(self.output_device)
-                self.loss = nn.CrossEntropyLoss().cuda(self.output_device)
             else:
                 self.model = PSTBLN(num_class=self.num_class, num_point=self.num_point, num_person=self.num_person,
                                     in_channels=self.in_channels, topology=self.topology, blocksize=self.blocksize,
                                     cuda_=False)
-                self.loss = nn.CrossEntropyLoss()
+            # functional cross-entropy: a single log-softmax reduction over the logits
+            # without module dispatch; accuracy reuses the logits through argmax, so no
+            # second softmax is ever materialized in the training loop
+            self.loss = F.cross_entropy
+            # cache the dropout modules of the freshly built model for __enable_dropout
+            self._dropout_mods = [each_module for each_module in self.model.modules()
+                                  if each_module.__class__.__name__.startswith('Dropout')]
+            # torch.compile fuses the many small elementwise kernels (batchnorm affine,
+            # ReLU, dropout mask) and removes eager dispatch overhead; binding the
+            # compiled callable to forward keeps state_dict keys and module attributes
+            # untouched for the checkpoint surgery and the in-place topology growth
+            if self.device == 'cuda' and hasattr(torch, 'compile') and not self.use_cuda_graph:
+                self.model.forward = torch.compile(self.model.forward, mode='reduce-overhead', fullgraph=False)
+            elif self.use_jit:
+                # trace rather than script: PSTBLN's dict-keyed layer loop and lambda
+                # residuals are not scriptable. Tracing bakes in the eval-mode dropout,
+                # so the traced module is inference-only (no fit or Monte Carlo Dropout)
+                self.model = torch.jit.trace(self.model.eval(), self.__example_input())
+                self.model_train_state = False
+                self._dropout_mods = []
             # print(self.model)
 
     def network_builder(self, dataset, val_dataset, monte_carlo_dropout=True, mcdo_repeats=100,
                         logging_path='', train_data_filename='train.npy',
                         train_labels_filename='train_labels.pkl', val_data_filename="val.npy",
                         val_labels_filename="val_labels.pkl", verbose=True):
+        # build the loaders once up front; their persistent workers then survive across
+        # the many fit invocations below instead of being re-spawned per (layer, block)
+        traindata = self.__prepare_dataset(dataset,
+                                           data_filename=train_data_filename,
+                                           labels_filename=train_labels_filename,
+                                           verbose=verbose)
+        train_loader = self.__make_loader(traindata, self.batch_size, shuffle=True, drop_last=True)
+        valdata = self.__prepare_dataset(val_dataset,
+                                         data_filename=val_data_filename,
+                                         labels_filename=val_labels_filename,
+                                         verbose=verbose)
+        val_loader = self.__make_loader(valdata, self.val_batch_size, shuffle=False, drop_last=False)
+
         # start building the model progressively
         loss_layer_old = 1e+10
         loss_block_old = 1e+10
@@ -491,30 +803,37 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
                     print('######################################################################\n')
                     print('layer.' + str(layer_iter) + '_block.' + str(block_iter))
                     print('\n######################################################################\n')
-                # add a new block
-                self.topology[layer_iter] = self.topology[layer_iter] + 1
-                # build the model and initialize it with random parameters
-                self.init_model()
-                if verbose:
-                    print("Model trainable parameters:", self.__count_parameters())
-                if layer_iter > 0 or block_iter > 0:
+                # add a new block; after the very first build the live model is grown in
+                # place, keeping its trained weights, instead of being reconstructed and
+                # reloaded from the previous checkpoint on every progression step
+                if layer_iter == 0 and block_iter == 0:
+                    self.topology[layer_iter] = self.topology[layer_iter] + 1
+                    # build the model and initialize it with random parameters
+                    self.init_model()
+                else:
+                    model_ = self.model.module if isinstance(self.model, nn.DataParallel) else self.model
                     if block_iter == 0:
-                        checkpoint_name = self.experiment_name + '-' + str(
-                                        len(self.topology) - 1) + '-' + str(self.topology[-2])
+                        # drop the 0 appended for the new layer; add_layer appends a
+                        # single fresh block to the shared topology list itself
+                        self.topology.pop()
+                        model_.add_layer()
                     else:
-                        checkpoint_name = self.experiment_name + '-' + str(
-                                        len(self.topology)) + '-' + str(self.topology[-1] - 1)
-
-                    checkpoints_folder = os.path.join(self.parent_dir, '{}_checkpoints'.format(self.experiment_name))
+                        model_.add_block(layer_iter)
+                    # the grown modules invalidate the cached dropout list and any
+                    # captured CUDA graphs
+                    self._dropout_mods = None
+                    self._mcdo_graphs = {}
                     self.ort_session = None
-                    self.load(checkpoints_folder, checkpoint_name)
+                if verbose:
+                    print("Model trainable parameters:", self.__count_parameters())
 
                 train_results = self.fit(dataset, val_dataset, logging_path,
                                          monte_carlo_dropout=monte_carlo_dropout, mcdo_repeats=mcdo_repeats,
                                          train_data_filename=train_data_filename,
                                          train_labels_filename=train_labels_filename,
                                          val_data_filename=val_data_filename,
-                                         val_labels_filename=val_labels_filename)
+                                         val_labels_filename=val_labels_filename,
+                                         train_loader=train_loader, val_loader=val_loader)
                 loss_block_new = train_results["train_loss"]
                 if block_iter > 0:
                     loss_b = -1 * (loss_block_new - loss_block_old) / loss_block_old
@@ -523,6 +842,9 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
                         if verbose:
                             print('block' + str(block_iter) + 'of layer' + str(layer_iter) + 'is removed \n')
                             print('block progression is stopped in layer' + str(layer_iter))
+                        # the live model still contains the rejected block, so rebuild it
+                        # from the last accepted checkpoint before progression continues
+                        self.__restore_from_checkpoint()
                         break
                 loss_block_old = loss_block_new
                 loss_layer_new = loss_block_new
@@ -533,11 +855,26 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
                     if verbose:
                         print('layer' + str(layer_iter) + 'is removed \n')
                         print('layer progression is stopped')
+                    # the live model still contains the rejected layer, so rebuild it
+                    # from the last accepted checkpoint before returning
+                    self.__restore_from_checkpoint()
                     break
             loss_layer_old = loss_layer_new
         np.save(os.path.join(self.parent_dir, 'Topology.npy'), self.topology)
         return self.topology
 
+    def __restore_from_checkpoint(self):
+        # Rebuilds the model for the current topology and reloads the checkpoint that
+        # fit() saved for it, discarding any rejected block or layer still present in
+        # the live model.
+        checkpoint_name = self.experiment_name + '-' + str(len(self.topology)) + '-' + str(self.topology[-1])
+        checkpoints_folder = os.path.join(self.parent_dir, '{}_checkpoints'.format(self.experiment_name))
+        self.ort_session = None
+        self._mcdo_graphs = {}
+        self.model = None
+        self.init_model()
+        self.load(checkpoints_folder, checkpoint_name)
+
     def infer(self, facial_landmarks_batch, monte_carlo_dropout=True, mcdo_repeats=100):
         """
         This method performs inference on the batch provided.
@@ -553,75 +890,150 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
         facial_landmarks_batch = torch.from_numpy(facial_landmarks_batch.numpy())
 
         if self.device == 'cuda':
-            facial_landmarks_batch = Variable(facial_landmarks_batch.float().cuda(self.output_device),
-                                              requires_grad=False)
+            if self._infer_stream is None:
+                self._infer_stream = torch.cuda.Stream(self.output_device)
+            # persistent staging buffers, reallocated only when the input shape changes:
+            # steady-state streaming reuses the same pinned DMA region and device tensor
+            # instead of paying an allocation plus page-pinning per frame
+            shape = tuple(facial_landmarks_batch.shape)
+            if self._infer_host_buf is None or tuple(self._infer_host_buf.shape) != shape:
+                self._infer_host_buf = torch.empty(shape, dtype=torch.float32, pin_memory=True)
+                self._infer_dev_buf = torch.empty(shape, dtype=torch.float32, device=self.output_device)
+            self._infer_host_buf.copy_(facial_landmarks_batch)
+            # the copy runs on a dedicated stream, so the DMA of the incoming frame
+            # overlaps the tail of the previous frame's kernels and the compute stream
+            # only waits for this frame's transfer to land
+            with torch.cuda.stream(self._infer_stream):
+                self._infer_dev_buf.copy_(self._infer_host_buf, non_blocking=True)
+            torch.cuda.current_stream(self.output_device).wait_stream(self._infer_stream)
+            facial_landmarks_batch = self._infer_dev_buf
         else:
-            facial_landmarks_batch = Variable(facial_landmarks_batch.float(), requires_grad=False)
+            facial_landmarks_batch = facial_landmarks_batch.float()
         if self.ort_session is not None:
-            output = self.ort_session.run(None, {'data': np.array(facial_landmarks_batch.cpu())})
+            # .numpy() is a zero-copy view over the host tensor; the old
+            # np.array(tensor.cpu()) materialized the input a second time
+            arr = facial_landmarks_batch.detach().cpu().numpy()
+            if not arr.flags['C_CONTIGUOUS']:
+                arr = np.ascontiguousarray(arr)
+            output = torch.from_numpy(self.ort_session.run(None, {'data': arr})[0])
         else:
             if self.model is None:
                 raise UserWarning('No model is loaded, cannot run inference. Load a model first using load().')
             if self.model_train_state:
                 self.model.eval()
                 self.model_train_state = False
-            with torch.no_grad():
+            # inference_mode (no_grad on torch older than 1.9) is strictly lighter than
+            # grad mode: no version counters or view tracking on any tensor created inside
+            with _inference_mode():
                 if monte_carlo_dropout:
-                    soft_ = torch.nn.Softmax(dim=1)
                     self.__enable_dropout()
-                    output = [self.model(facial_landmarks_batch) for _ in range(mcdo_repeats)]
-                    list_output = []
-                    probs = []
-                    for i in range(len(output)):
-                        list_output.append(output[i].cpu())
-                        probs.append(soft_(output[i].cpu()))
-                    mean_probs = torch.stack(probs).mean(axis=0)
-                    std_probs = torch.stack(probs).std(axis=0)
-                    print('mean predicted probability for each lass is:', mean_probs)
-                    print('uncertainty of the predictions for each lass is:', std_probs)
-                    output = torch.stack(list_output).mean(axis=0)
-                    if self.device == "cuda":
-                        output = output.cuda(self.output_device)
+                    # one forward over the tiled batch replaces mcdo_repeats sequential
+                    # model calls, whose launch latency dominates for landmark-sized
+                    # inputs; dropout masks are drawn per element, so every virtual
+                    # slice of the tiled batch still gets an independent mask. The
+                    # outputs stay resident on the device: softmax and the moments run
+                    # as fused kernels and only the final statistics are read back
+                    batch_size = facial_landmarks_batch.shape[0]
+                    tiled = facial_landmarks_batch.repeat(mcdo_repeats,
+                                                          *([1] * (facial_landmarks_batch.dim() - 1)))
+                    outputs = self.model(tiled).view(mcdo_repeats, batch_size, -1)
+                    probs = F.softmax(outputs, dim=2)
+                    mean_probs = probs.mean(dim=0)
+                    # population std: the repeats are the whole sample, and skipping the
+                    # Bessel correction saves a multiply over the (R, N, C) stack
+                    std_probs = probs.std(dim=0, unbiased=False)
+                    print('mean predicted probability for each class is:', mean_probs)
+                    print('uncertainty of the predictions for each class is:', std_probs)
+                    output = outputs.mean(dim=0)
                 else:
                     output = self.model(facial_landmarks_batch)
 
-        m = nn.Softmax(dim=0)
-        softmax_predictions = m(output.data[0])
-        class_confidence = float(torch.max(softmax_predictions))
-        class_ind = int(torch.argmax(softmax_predictions))
+        # functional softmax avoids constructing a module per call, and a single max
+        # yields both the confidence and the index, so only two scalar reads (one
+        # implicit sync each) remain instead of two full traversals plus two syncs
+        softmax_predictions = F.softmax(output[0], dim=0)
+        class_confidence, class_ind = softmax_predictions.max(dim=0)
+        class_confidence = class_confidence.item()
+        class_ind = class_ind.item()
         class_description = self.classes_dict[class_ind]
         category = Category(prediction=class_ind, confidence=class_confidence, description=class_description)
 
         return category
 
-    def optimize(self, do_constant_folding=False):
+    def optimize(self, do_constant_folding=True, quantize=False):
         """
         Optimize method converts the model to ONNX format and saves the
         model in the parent directory defined by self.temp_path. The ONNX model is then loaded.
-        :param do_constant_folding: whether to optimize constants, defaults to 'False'
+        :param do_constant_folding: whether to optimize constants, defaults to 'True'
         :type do_constant_folding: bool, optional
+        :param quantize: whether to additionally quantize the exported model to int8 weights with
+        onnxruntime's dynamic quantization, shrinking the file 3-4x and speeding up CPU inference
+        through the int8 GEMM kernels, defaults to 'False'
+        :type quantize: bool, optional
         """
         if self.model is None:
             raise UserWarning("No model is loaded, cannot optimize. Load or train a model first.")
         if self.ort_session is not None:
             raise UserWarning("Model is already optimized in ONNX.")
+        fp32_path = os.path.join(self.parent_dir, self.experiment_name, "onnx_model_temp.onnx")
+        int8_path = os.path.join(self.parent_dir, self.experiment_name, "onnx_model_temp_int8.onnx")
+        # save() hardlinks the temp files into the saved checkpoints; unlink them here so a
+        # re-export truncates a fresh inode instead of rewriting the saved copies in place
+        for stale_path in [fp32_path, int8_path]:
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
         try:
-            self.__convert_to_onnx(os.path.join(self.parent_dir, self.experiment_name, "onnx_model_temp.onnx"),
-                                   do_constant_folding)
+            self.__convert_to_onnx(fp32_path, do_constant_folding)
         except FileNotFoundError:
             # Create temp directory
             os.makedirs(os.path.join(self.parent_dir, self.experiment_name), exist_ok=True)
-            self.__convert_to_onnx(os.path.join(self.parent_dir, self.experiment_name, "onnx_model_temp.onnx"),
-                                   do_constant_folding)
+            self.__convert_to_onnx(fp32_path, do_constant_folding)
+
+        model_path = fp32_path
+        if quantize:
+            try:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+            except ImportError:
+                raise UserWarning("quantize=True requires a newer onnxruntime that ships the quantization tools "
+                                  "(onnxruntime.quantization); rerun optimize() without quantize or upgrade "
+                                  "onnxruntime.")
+            # int8 weights, fp32 activations: the matmul/conv weights dominate both the
+            # file size and the GEMM bandwidth of the landmark models
+            model_path = int8_path
+            quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8,
+                             op_types_to_quantize=['MatMul', 'Conv', 'Gemm'])
+        self._onnx_model_path = model_path
+        self.__load_from_onnx(model_path)
 
-        self.__load_from_onnx(os.path.join(self.parent_dir, self.experiment_name, "onnx_model_temp.onnx"))
+    def __example_input(self, batch_size=1):
+        """
+        Builds a zero tensor shaped like a preprocessed landmark batch of the configured
+        dataset, used as the example input when tracing the model.
+        :param batch_size: leading batch dimension of the returned tensor, defaults to 1
+        :type batch_size: int, optional
+        :return: a zeros tensor of the dataset's landmark shape, on the learner's device
+        :rtype: torch.Tensor
+        """
+        if self.dataset_name == 'CASIA':
+            c, t, v, m = [2, 5, 309, 1]
+        elif self.dataset_name == 'CK+':
+            c, t, v, m = [2, 150, 303, 1]
+        elif self.dataset_name == 'AFEW':
+            c, t, v, m = [2, 150, 312, 1]
+        else:
+            raise ValueError(self.dataset_name + "is not a valid dataset name. Supported datasets: CASIA,"
+                                                 " CK+, AFEW")
+        example = torch.zeros(batch_size, c, t, v, m)
+        if self.device == 'cuda':
+            example = example.cuda(self.output_device)
+        return example
 
-    def __convert_to_onnx(self, output_name, do_constant_folding=False, verbose=True):
+    def __convert_to_onnx(self, output_name, do_constant_folding=True, verbose=True):
         """
         Converts the loaded regular PyTorch model to an ONNX model and saves it to disk.
         :param output_name: path and name to save the model, e.g. "/models/onnx_model.onnx"
         :type output_name: str
-        :param do_constant_folding: whether to optimize constants, defaults to 'False'
+        :param do_constant_folding: whether to optimize constants, defaults to 'True'
         :type do_constant_folding: bool, optional
         """
         # Input to the model
@@ -637,15 +1049,24 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
         n = self.batch_size
         onnx_input = torch.randn(n, c, t, v, m)
         if self.device == "cuda":
-            onnx_input = Variable(onnx_input.float().cuda(self.output_device), requires_grad=False)
+            onnx_input = onnx_input.float().cuda(self.output_device)
         else:
-            onnx_input = Variable(onnx_input.float(), requires_grad=False)
-        # Export the model
+            onnx_input = onnx_input.float()
+        # Export the model at opset 13, whose Softmax/BatchNorm representations give the
+        # runtime's optimizer more fusion opportunities than the old default opset, and
+        # fold weights into the graph instead of keeping them as inputs
+        # (enable_onnx_checker was removed from newer torch exports; the check runs by
+        # default there). torch can only emit opset 13 from 1.8 on and onnxruntime only
+        # loads it from 1.5 on, so older pins fall back to opset 12
+        torch_version = tuple(int(p) for p in torch.__version__.split('+')[0].split('.')[:2])
+        ort_version = tuple(int(p) for p in onnxruntime.__version__.split('.')[:2])
+        opset = 13 if torch_version >= (1, 8) and ort_version >= (1, 5) else 12
         torch.onnx.export(self.model,  # model being run
                           onnx_input,  # model input (or a tuple for multiple inputs)
                           output_name,  # where to save the model (can be a file or file-like object)
                           verbose=verbose,
-                          enable_onnx_checker=True,
+                          opset_version=opset,
+                          keep_initializers_as_inputs=False,
                           do_constant_folding=do_constant_folding,
                           input_names=['onnx_input'],  # the model's input names
                           output_names=['onnx_output'],  # the model's output names
@@ -675,6 +1096,8 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
 
         if not os.path.exists(path):
             os.makedirs(path)
+        json_model_name = model_name + '.json'
+        json_model_path = os.path.join(path, json_model_name)
         if self.ort_session is None:
             checkpoint_name = model_name + '.pt'
             checkpoint_path = os.path.join(path, checkpoint_name)
@@ -682,27 +1105,53 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
             model_metadata["optimized"] = False
             model_metadata["format"] = "pt"
             state_dict = self.model.state_dict()
-            weights = OrderedDict([[k.split('module.')[-1], v.cpu()] for k, v in state_dict.items()])
-            torch.save(weights, checkpoint_path)
-            if verbose:
-                print("Saved Pytorch model.")
+            # detached host-side copies, so training can keep mutating the live weights
+            # while the background thread serializes them
+            weights = OrderedDict([[k.split('module.')[-1], v.detach().to('cpu', copy=True)]
+                                   for k, v in state_dict.items()])
+            # write the checkpoint off the training thread; disk I/O then overlaps with
+            # the next epoch instead of stalling it (load() waits for the pending write)
+            self.__wait_for_pending_save()
+            self._save_future = self._save_pool.submit(self.__write_checkpoint, weights, checkpoint_path,
+                                                       json_model_path, model_metadata, verbose)
         else:
             checkpoint_name = model_name + '.onnx'
             checkpoint_path = os.path.join(path, checkpoint_name)
             model_metadata["model_paths"] = [checkpoint_path]
             model_metadata["optimized"] = True
             model_metadata["format"] = "onnx"
-            # Copy already optimized model from temp path
-            shutil.copy2(os.path.join(self.parent_dir, self.experiment_name, "onnx_model_temp.onnx"),
-                         model_metadata["model_paths"][0])
+            # Copy already optimized model from temp path; on the same filesystem a
+            # hardlink is zero-copy, so try that first and only fall back to a full
+            # read+write copy across devices (the temp file must stay in place for
+            # later save calls, which rules out a plain rename)
+            onnx_model_path = self._onnx_model_path or os.path.join(self.parent_dir, self.experiment_name,
+                                                                    "onnx_model_temp.onnx")
+            try:
+                if os.path.exists(model_metadata["model_paths"][0]):
+                    os.remove(model_metadata["model_paths"][0])
+                os.link(onnx_model_path, model_metadata["model_paths"][0])
+            except OSError:
+                shutil.copy2(onnx_model_path, model_metadata["model_paths"][0])
             model_metadata["optimized"] = True
             if verbose:
                 print("Saved ONNX model.")
+            with open(json_model_path, 'w') as outfile:
+                json.dump(model_metadata, outfile)
 
-        json_model_name = model_name + '.json'
-        json_model_path = os.path.join(path, json_model_name)
+    @staticmethod
+    def __write_checkpoint(weights, checkpoint_path, json_model_path, model_metadata, verbose):
+        torch.save(weights, checkpoint_path)
         with open(json_model_path, 'w') as outfile:
             json.dump(model_metadata, outfile)
+        if verbose:
+            print("Saved Pytorch model.")
+
+    def __wait_for_pending_save(self):
+        # Blocks until the background checkpoint write has finished; an exception
+        # raised in the worker is re-raised here instead of being silently dropped.
+        if self._save_future is not None:
+            self._save_future.result()
+            self._save_future = None
 
     def load(self, path, model_name, verbose=True):
         """
@@ -714,6 +1163,8 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
         :param verbose: whether to print success message or not, defaults to 'False'
         :type verbose: bool, optional
         """
+        # a checkpoint may still be in flight on the background save thread
+        self.__wait_for_pending_save()
         with open(os.path.join(path, model_name + ".json")) as metadata_file:
             metadata = json.load(metadata_file)
         if not metadata["optimized"]:
@@ -735,18 +1186,17 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
         if path is not None:
             self.__print_log('Load weights from {}.'.format(path))
             try:
-                weights = torch.load(path)
+                # deserialize straight onto the target device; remapping afterwards
+                # would pay one extra full-weight copy and double the peak memory
+                map_location = 'cuda:{}'.format(self.output_device) if self.device == 'cuda' else 'cpu'
+                weights = torch.load(path, map_location=map_location)
             except FileNotFoundError as e:
                 e.strerror = "Pretrained weights '.pt' file must be placed in path provided. \n " \
                              "No such file or directory."
                 raise e
             if verbose:
                 print("Loading checkpoint")
-            if self.device == "cuda":
-                weights = OrderedDict(
-                    [[k.split('module.')[-1], v.cuda(self.output_device)] for k, v in weights.items()])
-            else:
-                weights = OrderedDict([[k.split('module.')[-1], v] for k, v in weights.items()])
+            weights = OrderedDict([[k.split('module.')[-1], v] for k, v in weights.items()])
             old_keys = list(weights.keys())
             if self.model is None and len(self.topology) == 0:
                 raise ValueError('the model is not built yet and it cannot be initialized.'
@@ -755,34 +1205,51 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
             elif self.model is None and len(self.topology) != 0:
                 self.init_model()
 
-            for current_key in self.model.state_dict():
+            # one pass accumulating every remapped tensor followed by a single
+            # load_state_dict call; the old cascade issued a full-state-dict load per
+            # matching key, which is quadratic in the number of keys. The membership
+            # test also fixes the ('g_conv' or 'bln_residual' or ...) truthiness bug
+            # that reduced the whole tuple to 'g_conv' alone, so batchnorm, residual
+            # and bln_residual tensors are now actually restored; tensors that grew
+            # with the topology receive the overlapping slice of the saved weights
+            model_state = self.model.state_dict()
+            block_iter = self.topology[-1] - 1
+            merged = OrderedDict()
+            for current_key in model_state:
+                if current_key not in old_keys:
+                    continue
+                saved = weights[current_key]
                 if 'rand_graph' in current_key:
-                    if current_key in old_keys:
-                        new_state_dict = OrderedDict({current_key: weights[current_key]})
-                        self.model.load_state_dict(new_state_dict, strict=False)
-                if ('g_conv' or 'bln_residual' or 'tcn.t_conv.bias' or 'residual' or 'bn.weight' or 'bn.bias' or
-                   'bn.running_mean' or 'bn.running_var') in current_key:
-                    if current_key in old_keys:
-                        A = self.model.state_dict()[current_key]
-                        old_sh = weights[current_key].shape
-                        A[:old_sh[0]] = weights[current_key]
-                        new_state_dict = OrderedDict({current_key: A})
-                        self.model.load_state_dict(new_state_dict, strict=False)
-                if 'tcn.t_conv.weight' in current_key:
-                    if current_key in old_keys:
-                        A = self.model.state_dict()[current_key]
-                        old_sh = weights[current_key].shape
-                        A[:old_sh[0], :old_sh[1]] = weights[current_key]
-                        new_state_dict = OrderedDict({current_key: A})
-                        self.model.load_state_dict(new_state_dict, strict=False)
-                block_iter = self.topology[-1]-1
-                if ('fc.weight' in current_key) and (block_iter > 0):
-                    if current_key in old_keys:
-                        A = self.model.state_dict()[current_key]
-                        old_sh = weights[current_key].shape
-                        A[:old_sh[0], :old_sh[1]] = weights[current_key]
-                        new_state_dict = OrderedDict({current_key: A})
-                        self.model.load_state_dict(new_state_dict, strict=False)
+                    merged[current_key] = saved
+                    continue
+                if 'fc.weight' in current_key and block_iter <= 0:
+                    continue
+                if any(s in current_key for s in _RESHAPE_KEYS):
+                    target = model_state[current_key]
+                    if saved.shape == target.shape:
+                        # common non-progressive load: hand the saved tensor over as-is
+                        # instead of copying it element-wise into the live one
+                        merged[current_key] = saved
+                    elif saved.dim() == target.dim() and saved.dim() > 0:
+                        region = tuple(slice(0, min(o, n)) for o, n in zip(saved.shape, target.shape))
+                        target[region] = saved[region]
+                        merged[current_key] = target
+            if merged:
+                self.model.load_state_dict(merged, strict=False)
+
+            if self.jit_freeze:
+                # inference-only: freezing propagates the loaded weights and attributes
+                # as constants and lets the fuser combine conv/bn/relu, but the frozen
+                # module can no longer be trained or used with Monte Carlo Dropout
+                # (eval-mode dropout is inlined away). The model is traced rather than
+                # scripted, since PSTBLN's dict-keyed layer loop and lambda residuals
+                # are not scriptable; the topology is fixed at this point anyway
+                frozen = torch.jit.trace(self.model.eval(), self.__example_input())
+                if hasattr(torch.jit, 'freeze'):
+                    frozen = torch.jit.freeze(frozen)
+                self.model = frozen
+                self.model_train_state = False
+                self._dropout_mods = []
 
     def __load_from_onnx(self, path):
         """
@@ -790,7 +1257,15 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
         :param path: path to ONNX model
         :type path: str
         """
-        self.ort_session = onnxruntime.InferenceSession(path)
+        # apply the full offline graph optimizations (constant folding, conv-bn and
+        # activation fusion) instead of the BASIC default, and pin the intra-op pool to
+        # the physical cores (approximated as half the logical ones) so the small
+        # landmark graphs are not oversubscribed
+        session_options = onnxruntime.SessionOptions()
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.intra_op_num_threads = max(1, (os.cpu_count() or 2) // 2)
+        session_options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        self.ort_session = onnxruntime.InferenceSession(path, session_options)
 
     def download(self, path=None, mode="train_data", verbose=True,
                  url=OPENDR_SERVER_URL + "perception/landmark_based_facial_expression_recognition/"):
@@ -821,65 +1296,38 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
             os.makedirs(os.path.join(path, self.dataset_name))
 
         if mode == "train_data":
+            file_names = ["train.npy", "train_labels.pkl"]
             if verbose:
                 print("Downloading train data...")
-            if not os.path.exists(os.path.join(path, self.dataset_name, "train.npy")):
-                # Download train data
-                file_url = os.path.join(url, 'data', self.dataset_name, "train.npy")
-                urlretrieve(file_url,
-                            os.path.join(path, self.dataset_name, "train.npy"))
-            else:
-                if verbose:
-                    print("train_data file already exists.")
-            # Download labels
-            if not os.path.exists(os.path.join(path, self.dataset_name, "train_labels.pkl")):
-                file_url = os.path.join(url, 'data', self.dataset_name, "train_labels.pkl")
-                urlretrieve(file_url,
-                            os.path.join(path, self.dataset_name, "train_labels.pkl"))
-            else:
-                if verbose:
-                    print("train_labels file already exists.")
-            if verbose:
-                print("Train data download complete.")
-            downloaded_files_path = os.path.join(path, self.dataset_name)
-
         elif mode == "val_data":
+            file_names = ["val.npy", "val_labels.pkl"]
             if verbose:
                 print("Downloading validation data...")
-            if not os.path.exists(os.path.join(path, self.dataset_name, "val.npy")):
-                # Download val data
-                file_url = os.path.join(url, 'data', self.dataset_name, "val.npy")
-                urlretrieve(file_url,
-                            os.path.join(path, self.dataset_name, "val.npy"))
-            else:
-                if verbose:
-                    print("val_data file already exists.")
-            # Download labels
-            if not os.path.exists(os.path.join(path, self.dataset_name, "val_labels.pkl")):
-                file_url = os.path.join(url, 'data', self.dataset_name, "val_labels.pkl")
-                urlretrieve(file_url,
-                            os.path.join(path, self.dataset_name, "val_labels.pkl"))
-            else:
-                if verbose:
-                    print("val_labels file already exists.")
-            if verbose:
-                print("Val data download complete.")
-            downloaded_files_path = os.path.join(path, self.dataset_name)
-
         elif mode == "test_data":
+            file_names = ["val.npy"]
             if verbose:
                 print("Downloading test data...")
-            if not os.path.exists(os.path.join(path, self.dataset_name, "val.npy")):
-                # Download test data
-                file_url = os.path.join(url, 'data', self.dataset_name, "val.npy")
-                urlretrieve(file_url,
-                            os.path.join(path, self.dataset_name, "val.npy"))
-            else:
+
+        pending = []
+        for file_name in file_names:
+            destination = os.path.join(path, self.dataset_name, file_name)
+            if os.path.exists(destination):
                 if verbose:
-                    print("test_data file already exists.")
-            if verbose:
-                print("Test data download complete.")
+                    print("{} file already exists.".format(file_name))
+            else:
+                pending.append((os.path.join(url, 'data', self.dataset_name, file_name), destination))
+        if pending:
+            # network latency dominates these small files; fetching them concurrently
+            # makes the wall time close to the slowest single file instead of the sum
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                list(executor.map(lambda pair: urlretrieve(*pair), pending))
+
+        if verbose:
+            print("{} download complete.".format(mode))
+        if mode == "test_data":
             downloaded_files_path = os.path.join(path, self.dataset_name, "val.npy")
+        else:
+            downloaded_files_path = os.path.join(path, self.dataset_name)
 
         return downloaded_files_path
 
@@ -893,12 +1341,19 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
         return split_time
 
     def __print_log(self, str_log, print_time=True):
+        # bail out before any timestamp or formatting work; this runs several times per
+        # epoch and logging is off in the common case
+        if not self.logging:
+            return
         if print_time:
-            localtime = time.asctime(time.localtime(time.time()))
-            str_log = "[ " + localtime + ' ] ' + str_log
-        if self.logging:
-            with open('{}/log.txt'.format(self.logging_path), 'a') as f:
-                print(str_log, file=f)
+            str_log = "[ " + datetime.now().isoformat(sep=' ', timespec='seconds') + ' ] ' + str_log
+        log_path = '{}/log.txt'.format(self.logging_path)
+        # keep the handle open across calls instead of an open/close syscall per line
+        if self._log_file is None or self._log_file.name != log_path:
+            if self._log_file is not None:
+                self._log_file.close()
+            self._log_file = open(log_path, 'a')
+        print(str_log, file=self._log_file, flush=True)
 
     def __count_parameters(self):
         """
@@ -910,6 +1365,15 @@ class ProgressiveSpatioTemporalBLNLearner(Learner):
             raise UserWarning("Model is not initialized, can't count trainable parameters.")
         return sum(p.numel() for p in self.model.parameters() if p.requires_grad)
 
+    @staticmethod
+    def __worker_init(worker_id):
+        # seeds the Python and NumPy RNGs of a freshly spawned DataLoader worker from
+        # the torch base seed; the previous code invoked the seeding in the parent and
+        # handed None to the loader, reseeding the main process on every construction
+        seed = (torch.initial_seed() + worker_id) & 0xFFFFFFFF
+        np.random.seed(seed)
+        random.seed(seed)
+
     def __init_seed(self, seed):
         if self.device == "cuda":
             torch.cuda.manual_seed_all(seed)
@@ -161,6 +161,32 @@ class CocoTrainDataset(Dataset):
                     paf_map[1, y, x] = y_ba
 
 
+class CocoValPrecomputedDataset(Dataset):
+    """Serves validation images from a single pre-decoded, memory-mapped uint8 array
+    produced by the precompute_coco_eval.py script, so evaluation skips the per-image
+    JPEG decode. Images are stored at their native resolution, zero-padded to the
+    largest image in the set, and cropped back to their real size on access."""
+
+    def __init__(self, precomputed_dir):
+        super().__init__()
+        with open(os.path.join(precomputed_dir, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        self._images = meta['images']
+        self._data = np.memmap(os.path.join(precomputed_dir, 'images.bin'), dtype=np.uint8, mode='r',
+                               shape=(len(self._images), meta['max_height'], meta['max_width'], 3))
+
+    def __getitem__(self, idx):
+        entry = self._images[idx]
+        img = np.ascontiguousarray(self._data[idx, :entry['height'], :entry['width']])
+        return {
+            'img': img,
+            'file_name': entry['file_name']
+        }
+
+    def __len__(self):
+        return len(self._images)
+
+
 class CocoValDataset(Dataset):
     def __init__(self, labels, images_folder):
         super().__init__()
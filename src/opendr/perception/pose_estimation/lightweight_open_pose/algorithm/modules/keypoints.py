@@ -1,6 +1,4 @@
-import math
 import numpy as np
-from operator import itemgetter
 
 BODY_PARTS_KPT_IDS = [[1, 2], [1, 5], [2, 3], [3, 4], [5, 6], [6, 7], [1, 8], [8, 9], [9, 10], [1, 11],
                       [11, 12], [12, 13], [1, 0], [0, 14], [14, 16], [0, 15], [15, 17], [2, 16], [5, 17]]
@@ -22,19 +20,25 @@ def extract_keypoints(heatmap, all_keypoints, total_keypoint_num):
                     (heatmap_center > heatmap_up) & \
                     (heatmap_center > heatmap_down)
     heatmap_peaks = heatmap_peaks[1:heatmap_center.shape[0] - 1, 1:heatmap_center.shape[1] - 1]
-    keypoints = list(zip(np.nonzero(heatmap_peaks)[1], np.nonzero(heatmap_peaks)[0]))  # (w, h)
-    keypoints = sorted(keypoints, key=itemgetter(0))
-
-    suppressed = np.zeros(len(keypoints), np.uint8)
+    peak_rows, peak_cols = np.nonzero(heatmap_peaks)
+    if len(peak_rows) == 0:
+        all_keypoints.append([])
+        return 0
+    # (w, h) pairs ordered by column; the stable sort keeps the original row order on ties
+    order = np.argsort(peak_cols, kind='stable')
+    keypoints = np.stack((peak_cols[order], peak_rows[order]), axis=1)
+
+    # Precomputed pairwise squared distances replace the per-pair python loop; suppression
+    # stays greedy in sorted order, so the selected peaks match the previous implementation
+    diffs = keypoints[:, None, :] - keypoints[None, :, :]
+    close = (diffs * diffs).sum(axis=2) < 36  # squared 6-pixel suppression radius
+    suppressed = np.zeros(len(keypoints), dtype=bool)
     keypoints_with_score_and_id = []
     keypoint_num = 0
     for i in range(len(keypoints)):
         if suppressed[i]:
             continue
-        for j in range(i + 1, len(keypoints)):
-            if math.sqrt((keypoints[i][0] - keypoints[j][0]) ** 2 +
-                         (keypoints[i][1] - keypoints[j][1]) ** 2) < 6:
-                suppressed[j] = 1
+        suppressed[i + 1:] |= close[i, i + 1:]
         keypoint_with_score_and_id = (keypoints[i][0], keypoints[i][1], heatmap[keypoints[i][1], keypoints[i][0]],
                                       total_keypoint_num + keypoint_num)
         keypoints_with_score_and_id.append(keypoint_with_score_and_id)
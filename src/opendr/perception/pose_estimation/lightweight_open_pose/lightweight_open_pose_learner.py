@@ -13,6 +13,8 @@
 # limitations under the License.
 
 # General imports
+import contextlib
+import gc
 import onnxruntime as ort
 import os
 import ntpath
@@ -53,7 +55,8 @@ from opendr.perception.pose_estimation.lightweight_open_pose.algorithm.modules.l
 from opendr.perception.pose_estimation.lightweight_open_pose.algorithm.modules.keypoints import \
     extract_keypoints, group_keypoints
 from opendr.perception.pose_estimation.lightweight_open_pose.algorithm.datasets.coco import CocoTrainDataset
-from opendr.perception.pose_estimation.lightweight_open_pose.algorithm.datasets.coco import CocoValDataset
+from opendr.perception.pose_estimation.lightweight_open_pose.algorithm.datasets.coco import CocoValDataset, \
+    CocoValPrecomputedDataset
 from opendr.perception.pose_estimation.lightweight_open_pose.algorithm.datasets.transformations import \
     ConvertKeypoints, Scale, Rotate, CropPad, Flip
 from opendr.perception.pose_estimation.lightweight_open_pose.algorithm.val import \
@@ -65,6 +68,14 @@ cv2.setNumThreads(0)
 cv2.ocl.setUseOpenCL(False)  # To prevent freeze of DataLoader
 
 
+def _cpu_bf16_autocast():
+    # torch.autocast with a CPU device type only exists from torch 1.10 on; on older
+    # versions the half-precision CPU path simply runs the forward in fp32
+    if hasattr(torch, 'autocast'):
+        return torch.autocast(device_type="cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
 class LightweightOpenPoseLearner(Learner):
     def __init__(self, lr=4e-5, epochs=280, batch_size=80, device='cuda', backbone='mobilenet',
                  lr_schedule='', temp_path='temp', checkpoint_after_iter=5000, checkpoint_load_iter=0,
@@ -73,7 +84,7 @@ class LightweightOpenPoseLearner(Learner):
                  experiment_name='default', num_workers=8, weights_only=True, output_name='detections.json',
                  multiscale=False, scales=None, visualize=False, base_height=256,
                  img_mean=np.array([128, 128, 128], np.float32), img_scale=np.float32(1 / 256), pad_value=(0, 0, 0),
-                 half_precision=False):
+                 half_precision=False, use_cuda_graph=False):
         super(LightweightOpenPoseLearner, self).__init__(lr=lr, batch_size=batch_size, lr_schedule=lr_schedule,
                                                          checkpoint_after_iter=checkpoint_after_iter,
                                                          checkpoint_load_iter=checkpoint_load_iter,
@@ -126,6 +137,16 @@ class LightweightOpenPoseLearner(Learner):
 
         self.ort_session = None  # ONNX runtime inference session
         self.model_train_state = True
+        # If set, inference forward passes are captured into CUDA graphs and replayed, which
+        # removes per-kernel launch overhead. Requires fully static input shapes per capture
+        # and torch >= 1.10 for torch.cuda.CUDAGraph.
+        if use_cuda_graph and not hasattr(torch.cuda, "CUDAGraph"):
+            print("Warning: use_cuda_graph requires torch >= 1.10, falling back to the regular forward.")
+            use_cuda_graph = False
+        self.use_cuda_graph = use_cuda_graph and self.device == "cuda"
+        self._cuda_graphs = {}  # Captured forward graphs, keyed by input shape
+        self._copy_stream = None  # Dedicated CUDA stream for host->device input copies
+        self._copy_staging_buf = None  # Persistent pinned host buffer feeding the copy stream
 
     def fit(self, dataset, val_dataset=None, logging_path='', logging_flush_secs=30,
             silent=False, verbose=True, epochs=None, use_val_subset=True, val_subset_size=250,
@@ -456,7 +477,8 @@ class LightweightOpenPoseLearner(Learner):
         return {"paf_losses": paf_losses, "heatmap_losses": heatmap_losses, "eval_results_list": eval_results_list}
 
     def eval(self, dataset, silent=False, verbose=True, use_subset=True, subset_size=250,
-             images_folder_name="val2017", annotations_filename="person_keypoints_val2017.json"):
+             images_folder_name="val2017", annotations_filename="person_keypoints_val2017.json",
+             use_precomputed=False):
         """
         This method is used to evaluate a trained model on an evaluation dataset.
 
@@ -478,6 +500,11 @@ class LightweightOpenPoseLearner(Learner):
         :param annotations_filename: Filename of the annotations json file. This file should be contained in the
             dataset path provided, defaults to 'pesron_keypoints_val2017.json'
         :type annotations_filename: str, optional
+        :param use_precomputed: If set to True, images are read from the pre-decoded memory-mapped shard
+            created by the precompute_coco_eval.py script inside a "precomputed" folder in the dataset path,
+            skipping the per-image JPEG decode. The shard must have been built from the same annotations
+            file (or subset) used for this evaluation, defaults to 'False'
+        :type use_precomputed: bool, optional
 
         :returns: returns stats regarding evaluation
         :rtype: dict
@@ -489,6 +516,12 @@ class LightweightOpenPoseLearner(Learner):
                                           images_folder_default_name=images_folder_name,
                                           annotations_filename=annotations_filename,
                                           verbose=verbose and not silent)
+        if use_precomputed:
+            precomputed_dir = os.path.join(dataset.path, "precomputed")
+            if not os.path.isdir(precomputed_dir):
+                raise UserWarning("use_precomputed is set, but no precomputed shard was found in " +
+                                  precomputed_dir + ". Run the precompute_coco_eval.py script first.")
+            data = CocoValPrecomputedDataset(precomputed_dir)
         # Model initialization if needed
         if self.model is None and self.checkpoint_load_iter != 0:
             # No model loaded, initializing new
@@ -514,25 +547,35 @@ class LightweightOpenPoseLearner(Learner):
             #     load_from_mobilenet(self.model, checkpoint)
             # else:
             load_state(self.model, checkpoint)
-        elif self.model is None:
+        elif self.model is None and self.ort_session is None:
             raise AttributeError("self.model is None. Please load a model or set checkpoint_load_iter.")
 
-        self.model = self.model.eval()  # Change model state to evaluation
-        if self.device == "cuda":
-            self.model = self.model.cuda()
-            if self.half:
-                self.model.half()
+        if self.model is not None:
+            self.model = self.model.eval()  # Change model state to evaluation
+            if self.device == "cuda":
+                self.model = self.model.cuda()
+                if self.half:
+                    self.model.half()
 
         if self.multiscale:
             self.scales = [0.5, 1.0, 1.5, 2.0]
 
         coco_result = []
 
+        # Decode and prefetch the evaluation images on background workers, so image decoding
+        # runs in parallel with inference instead of leaving the device idle
+        if isinstance(data, (CocoValDataset, CocoValPrecomputedDataset)) and self.num_workers > 0:
+            # collate_fn keeps each sample as the dict of numpy arrays the loop below expects
+            sample_iterator = DataLoader(data, batch_size=None, num_workers=self.num_workers,
+                                         collate_fn=lambda sample: sample)
+        else:
+            sample_iterator = data
+
         pbar_eval = None
         if not silent:
             pbarDesc = "Evaluation progress"
             pbar_eval = tqdm(desc=pbarDesc, total=len(data), bar_format="{l_bar}%s{bar}{r_bar}" % '\x1b[38;5;231m')
-        for sample in data:
+        for sample in sample_iterator:
             file_name = sample['file_name']
             img = sample['img']
             avg_heatmaps, avg_pafs, _, _ = self.__infer_eval(img)
@@ -566,7 +609,7 @@ class LightweightOpenPoseLearner(Learner):
                 pbar_eval.update(1)
         if not silent:
             pbar_eval.close()
-        if self.model_train_state:
+        if self.model is not None and self.model_train_state:
             self.model = self.model.train()  # Revert model state to train
 
         with open(self.output_name, 'w') as f:
@@ -610,7 +653,9 @@ class LightweightOpenPoseLearner(Learner):
         height, width, _ = img.shape
         scale = self.base_height / height
 
-        scaled_img = cv2.resize(img, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+        # INTER_AREA is both faster and less aliasing-prone than INTER_LINEAR when downscaling
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        scaled_img = cv2.resize(img, (0, 0), fx=scale, fy=scale, interpolation=interpolation)
         scaled_img = normalize(scaled_img, self.img_mean, self.img_scale)
         min_dims = [self.base_height, max(scaled_img.shape[1], self.base_height)]
         padded_img, pad = pad_width(scaled_img, self.stride, self.pad_value, min_dims)
@@ -622,7 +667,7 @@ class LightweightOpenPoseLearner(Learner):
                 tensor_img = tensor_img.half()
 
         if self.ort_session is not None:
-            stages_output = self.ort_session.run(None, {'data': np.array(tensor_img.cpu())})
+            stages_output = self.__ort_run(tensor_img)
             stage2_heatmaps = torch.tensor(stages_output[-2])
             stage2_pafs = torch.tensor(stages_output[-1])
         else:
@@ -631,7 +676,14 @@ class LightweightOpenPoseLearner(Learner):
             if self.model_train_state:
                 self.model.eval()
                 self.model_train_state = False
-            stages_output = self.model(tensor_img)
+            if self.device == "cpu" and self.half:
+                # bfloat16 keeps fp32-like dynamic range, so activations can run at half width
+                # on BF16-capable CPUs; outputs are cast back since numpy has no bfloat16
+                with _cpu_bf16_autocast():
+                    stages_output = self.model(tensor_img)
+                stages_output = [stage_output.float() for stage_output in stages_output]
+            else:
+                stages_output = self.model(tensor_img)
             stage2_heatmaps = stages_output[-2]
             stage2_pafs = stages_output[-1]
 
@@ -811,14 +863,53 @@ class LightweightOpenPoseLearner(Learner):
                 self.model.half()
         self.model.train(False)
 
-    def __load_from_onnx(self, path):
+    def __load_from_onnx(self, path, use_tensorrt=False, reuse_cached=False):
         """
-        This method loads an ONNX model from the path provided into an onnxruntime inference session.
+        This method loads an ONNX model from the path provided into an onnxruntime inference session. The session is
+        built with extended graph-level optimizations enabled and the optimized graph is saved next to the original
+        model; with reuse_cached set, a previously saved optimized graph is loaded instead of rerunning the
+        optimization pass. If use_tensorrt is set, the TensorRT execution provider is requested with FP16 enabled
+        and the built engine is cached on disk, so the engine build cost is paid only once.
 
         :param path: path to ONNX model
         :type path: str
+        :param use_tensorrt: whether to run the model through the TensorRT execution provider, defaults to 'False'
+        :type use_tensorrt: bool, optional
+        :param reuse_cached: whether an optimized graph left in self.temp_path by a previous session may be loaded
+            in place of the model at path; only safe when it is known to come from the same model, defaults to
+            'False'
+        :type reuse_cached: bool, optional
         """
-        self.ort_session = ort.InferenceSession(path)
+        optimized_path = os.path.join(self.temp_path, "onnx_model_opt.onnx")
+        sess_options = ort.SessionOptions()
+        # ORT_ENABLE_EXTENDED instead of ORT_ENABLE_ALL, so that no hardware-specific layout
+        # transformations get baked into the optimized graph saved on disk
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+        if reuse_cached and os.path.exists(optimized_path):
+            # Reuse the graph optimized during a previous session
+            path = optimized_path
+        else:
+            sess_options.optimized_model_filepath = optimized_path
+        if use_tensorrt:
+            ort_version = tuple(int(p) for p in ort.__version__.split('.')[:2])
+            if ort_version < (1, 7):
+                print("Warning: requesting the TensorRT execution provider with options requires "
+                      "onnxruntime >= 1.7, session falls back to the default providers.")
+                use_tensorrt = False
+        if use_tensorrt:
+            trt_options = {"trt_fp16_enable": True,
+                           "trt_engine_cache_enable": True,
+                           "trt_engine_cache_path": os.path.join(self.temp_path, "trt_cache")}
+            if self.use_cuda_graph:
+                trt_options["trt_cuda_graph_enable"] = True
+            providers = [("TensorrtExecutionProvider", trt_options),
+                         "CUDAExecutionProvider", "CPUExecutionProvider"]
+            self.ort_session = ort.InferenceSession(path, sess_options, providers=providers)
+            if self.ort_session.get_providers()[0] != "TensorrtExecutionProvider":
+                print("Warning: TensorRT execution provider was requested but is not available, "
+                      "session fell back to:", self.ort_session.get_providers()[0])
+        else:
+            self.ort_session = ort.InferenceSession(path, sess_options)
 
         # The comments below are the alternative way to use the onnx model, it might be useful in the future
         # depending on how ONNX saving/loading will be implemented across the toolkit.
@@ -831,6 +922,88 @@ class LightweightOpenPoseLearner(Learner):
         # # Print a human readable representation of the graph
         # onnx.helper.printable_graph(self.model.graph)
 
+    def __copy_to_device(self, tensor_img):
+        """
+        Copies a preprocessed input tensor to the CUDA device through a pinned staging buffer on a dedicated copy
+        stream, so the transfer of the next image can overlap with compute still in flight on the default stream.
+
+        :param tensor_img: preprocessed input image residing in host memory
+        :type tensor_img: torch.Tensor
+        :return: the input tensor on the CUDA device
+        :rtype: torch.Tensor
+        """
+        if self._copy_stream is None:
+            self._copy_stream = torch.cuda.Stream()
+        # stage through a persistent pinned buffer instead of pinning fresh host memory on
+        # every call; reallocated only when the input shape changes (e.g. a new image width)
+        if (self._copy_staging_buf is None or self._copy_staging_buf.shape != tensor_img.shape or
+                self._copy_staging_buf.dtype != tensor_img.dtype):
+            self._copy_staging_buf = torch.empty_like(tensor_img, pin_memory=True)
+        self._copy_staging_buf.copy_(tensor_img)
+        with torch.cuda.stream(self._copy_stream):
+            device_img = self._copy_staging_buf.cuda(non_blocking=True)
+        torch.cuda.current_stream().wait_stream(self._copy_stream)
+        # the tensor was allocated on the copy stream but is consumed on the current stream;
+        # tell the caching allocator, so its memory is not handed out to later copy-stream
+        # work while the forward pass is still reading it
+        device_img.record_stream(torch.cuda.current_stream())
+        if self.half:
+            device_img = device_img.half()
+        return device_img
+
+    def __graph_forward(self, tensor_img):
+        """
+        Runs the model forward pass by replaying a captured CUDA graph, capturing a new graph the first time each
+        input shape is encountered. Replaying skips the per-kernel launch overhead of the regular eager forward,
+        which dominates runtime for the small fixed-shape inputs used during evaluation.
+
+        :param tensor_img: preprocessed input image, residing on the CUDA device
+        :type tensor_img: torch.Tensor
+        :return: the raw network outputs
+        :rtype: list of torch.Tensor
+        """
+        shape = tuple(tensor_img.shape)
+        if shape not in self._cuda_graphs:
+            with torch.no_grad():
+                # Warmup on a side stream, as required before graph capture
+                stream = torch.cuda.Stream()
+                stream.wait_stream(torch.cuda.current_stream())
+                with torch.cuda.stream(stream):
+                    for _ in range(3):
+                        self.model(tensor_img)
+                torch.cuda.current_stream().wait_stream(stream)
+                static_input = tensor_img.clone()
+                graph = torch.cuda.CUDAGraph()
+                with torch.cuda.graph(graph):
+                    static_outputs = self.model(static_input)
+            self._cuda_graphs[shape] = (graph, static_input, static_outputs)
+        graph, static_input, static_outputs = self._cuda_graphs[shape]
+        static_input.copy_(tensor_img, non_blocking=True)
+        graph.replay()
+        return static_outputs
+
+    def __ort_run(self, tensor_img):
+        """
+        Runs the ONNX session on the preprocessed input tensor and returns the network outputs as numpy arrays.
+        When running on CUDA, the input is bound directly from the on-device torch tensor through ORT IO binding,
+        so no redundant host<->device round-trip is performed per call.
+
+        :param tensor_img: preprocessed input image
+        :type tensor_img: torch.Tensor
+        :return: the raw network outputs
+        :rtype: list of numpy arrays
+        """
+        if self.device == "cuda" and "CUDAExecutionProvider" in self.ort_session.get_providers():
+            tensor_img = tensor_img.float().contiguous()
+            io_binding = self.ort_session.io_binding()
+            io_binding.bind_input(name='data', device_type='cuda', device_id=0, element_type=np.float32,
+                                  shape=tuple(tensor_img.shape), buffer_ptr=tensor_img.data_ptr())
+            for output in self.ort_session.get_outputs():
+                io_binding.bind_output(output.name)
+            self.ort_session.run_with_iobinding(io_binding)
+            return io_binding.copy_outputs_to_cpu()
+        return self.ort_session.run(None, {'data': np.array(tensor_img.float().cpu())})
+
     @staticmethod
     def __extract_trailing(path):
         """
@@ -868,27 +1041,66 @@ class LightweightOpenPoseLearner(Learner):
                           do_constant_folding=do_constant_folding, input_names=input_names, output_names=output_names,
                           dynamic_axes={"data": {3: "width"}})
 
-    def optimize(self, do_constant_folding=False):
+    def optimize(self, do_constant_folding=False, use_tensorrt=False, reuse_cached=False, rebuild=False,
+                 free_model=False):
         """
         Optimize method converts the model to ONNX format and saves the
-        model in the parent directory defined by self.temp_path. The ONNX model is then loaded.
+        model in the parent directory defined by self.temp_path. The ONNX model is then loaded. By default the model
+        is always exported fresh from the currently loaded weights and any converted model or optimized graph left
+        over in self.temp_path is discarded first; with reuse_cached set, leftovers from a previous run are reused
+        together with the cached TensorRT engine, so warm starts with an unchanged model skip both the export and
+        the engine/graph builds.
 
         :param do_constant_folding: whether to optimize constants, defaults to 'False'
         :type do_constant_folding: bool, optional
+        :param use_tensorrt: whether to run the converted model through the TensorRT execution provider with FP16
+            enabled, defaults to 'False'
+        :type use_tensorrt: bool, optional
+        :param reuse_cached: whether an ONNX model, optimized graph and TensorRT engine cache left over from
+            previous runs may be reused instead of exporting the currently loaded model; the caller is responsible
+            for the cached artifacts actually matching the loaded weights, defaults to 'False'
+        :type reuse_cached: bool, optional
+        :param rebuild: if set to True, the TensorRT engine cache is additionally discarded and rebuilt; implies
+            a fresh export regardless of reuse_cached, defaults to 'False'
+        :type rebuild: bool, optional
+        :param free_model: if set to True, the PyTorch model is released once the ONNX session is active, freeing
+            its device memory. infer() and eval() then run exclusively through the ONNX session; the model has to
+            be loaded again before any further training or ONNX export, defaults to 'False'
+        :type free_model: bool, optional
         """
         if self.model is None:
             raise UserWarning("No model is loaded, cannot optimize. Load or train a model first.")
         if self.ort_session is not None:
             raise UserWarning("Model is already optimized in ONNX.")
 
-        try:
-            self.__convert_to_onnx(os.path.join(self.temp_path, "onnx_model_temp.onnx"), do_constant_folding)
-        except FileNotFoundError:
-            # Create temp directory
-            os.makedirs(self.temp_path, exist_ok=True)
-            self.__convert_to_onnx(os.path.join(self.temp_path, "onnx_model_temp.onnx"), do_constant_folding)
-
-        self.__load_from_onnx(os.path.join(self.temp_path, "onnx_model_temp.onnx"))
+        onnx_path = os.path.join(self.temp_path, "onnx_model_temp.onnx")
+        if rebuild:
+            reuse_cached = False
+            if os.path.isdir(os.path.join(self.temp_path, "trt_cache")):
+                shutil.rmtree(os.path.join(self.temp_path, "trt_cache"))
+
+        if not (reuse_cached and os.path.exists(onnx_path)):
+            # discard leftovers from previous runs, so the session built below cannot silently
+            # serve a stale export or a stale optimized graph instead of the current weights
+            for stale_path in [onnx_path, os.path.join(self.temp_path, "onnx_model_opt.onnx")]:
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+            try:
+                self.__convert_to_onnx(onnx_path, do_constant_folding)
+            except FileNotFoundError:
+                # Create temp directory
+                os.makedirs(self.temp_path, exist_ok=True)
+                self.__convert_to_onnx(onnx_path, do_constant_folding)
+
+        self.__load_from_onnx(onnx_path, use_tensorrt=use_tensorrt, reuse_cached=reuse_cached)
+
+        if free_model:
+            # Inference dispatches on self.ort_session from here on, so the PyTorch copy
+            # of the weights only wastes device memory
+            self.model = None
+            gc.collect()
+            if self.device == "cuda":
+                torch.cuda.empty_cache()
 
     def reset(self):
         """This method is not used in this implementation."""
@@ -1045,16 +1257,27 @@ class LightweightOpenPoseLearner(Learner):
 
         pad = None
         for ratio in scales_ratios:
-            scaled_img = cv2.resize(normed_img, (0, 0), fx=ratio, fy=ratio, interpolation=cv2.INTER_CUBIC)
+            # INTER_AREA is both faster and less aliasing-prone than INTER_CUBIC when downscaling
+            interpolation = cv2.INTER_AREA if ratio < 1 else cv2.INTER_CUBIC
+            scaled_img = cv2.resize(normed_img, (0, 0), fx=ratio, fy=ratio, interpolation=interpolation)
             min_dims = [base_height, max(scaled_img.shape[1], base_height)]
             padded_img, pad = pad_width(scaled_img, stride, pad_value, min_dims)
 
             tensor_img = torch.from_numpy(padded_img).permute(2, 0, 1).unsqueeze(0).float()
             if self.device == "cuda":
-                tensor_img = tensor_img.cuda()
-                if self.half:
-                    tensor_img = tensor_img.half()
-            stages_output = self.model(tensor_img)
+                tensor_img = self.__copy_to_device(tensor_img)
+            if self.ort_session is not None:
+                stages_output = self.__ort_run(tensor_img)
+                stages_output = [torch.tensor(stage_output) for stage_output in stages_output]
+            elif self.use_cuda_graph:
+                stages_output = self.__graph_forward(tensor_img)
+            elif self.device == "cpu" and self.half:
+                # Same bfloat16 autocast as in infer(): half-width activations on BF16 CPUs
+                with _cpu_bf16_autocast():
+                    stages_output = self.model(tensor_img)
+                stages_output = [stage_output.float() for stage_output in stages_output]
+            else:
+                stages_output = self.model(tensor_img)
 
             stage2_heatmaps = stages_output[-2]
             heatmaps = np.transpose(stage2_heatmaps.squeeze().cpu().data.numpy(), (1, 2, 0))
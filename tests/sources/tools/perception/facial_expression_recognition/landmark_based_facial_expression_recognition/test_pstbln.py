@@ -124,6 +124,34 @@ class TestLandmarkBasedFacialExpressionRecognition(unittest.TestCase):
         category = self.pstbln_facial_expression_classifier.infer(test_data)
         self.assertIsNotNone(category.confidence, msg="The predicted confidence score is None")
 
+    def test_add_block(self):
+        self.pstbln_facial_expression_classifier.topology = [1]
+        self.pstbln_facial_expression_classifier.init_model()
+        model = self.pstbln_facial_expression_classifier.model
+        old_conv = model.layers['l0'].bln.g_conv[0].weight.clone()
+        old_fc = model.fc.weight.clone()
+        model.add_block(0)
+        self.assertEqual(model.topology, [2], msg="Model topology did not grow after add_block.")
+        conv_region = tuple(slice(0, s) for s in old_conv.shape)
+        self.assertTrue(torch.equal(model.layers['l0'].bln.g_conv[0].weight[conv_region], old_conv),
+                        msg="Trained conv weights did not survive add_block.")
+        fc_region = tuple(slice(0, s) for s in old_fc.shape)
+        self.assertTrue(torch.equal(model.fc.weight[fc_region], old_fc),
+                        msg="Trained classifier weights did not survive add_block.")
+
+    def test_add_layer(self):
+        self.pstbln_facial_expression_classifier.topology = [1]
+        self.pstbln_facial_expression_classifier.init_model()
+        model = self.pstbln_facial_expression_classifier.model
+        old_conv = model.layers['l0'].bln.g_conv[0].weight.clone()
+        model.add_layer()
+        self.assertEqual(model.num_layers, 2, msg="Model layer count did not grow after add_layer.")
+        self.assertIn('l1', model.layers, msg="New layer is missing after add_layer.")
+        self.assertTrue(torch.equal(model.layers['l0'].bln.g_conv[0].weight, old_conv),
+                        msg="Existing layer weights changed after add_layer.")
+        with self.assertRaises(ValueError):
+            model.add_block(0)
+
     def test_save_load(self):
         self.pstbln_facial_expression_classifier.topology = [1]
         self.pstbln_facial_expression_classifier.ort_session = None
@@ -138,6 +166,27 @@ class TestLandmarkBasedFacialExpressionRecognition(unittest.TestCase):
         # Cleanup
         rmdir(os.path.join(self.temp_dir, self.experiment_name))
 
+    def test_save_load_grown_model(self):
+        self.pstbln_facial_expression_classifier.topology = [1]
+        self.pstbln_facial_expression_classifier.ort_session = None
+        self.pstbln_facial_expression_classifier.init_model()
+        self.pstbln_facial_expression_classifier.model.add_block(0)
+        saved_conv = self.pstbln_facial_expression_classifier.model.layers['l0'].bln.g_conv[0].weight.clone()
+        saved_fc = self.pstbln_facial_expression_classifier.model.fc.weight.clone()
+        self.pstbln_facial_expression_classifier.save(path=os.path.join(self.temp_dir, self.experiment_name),
+                                                      model_name='grown_model')
+        self.pstbln_facial_expression_classifier.model = None
+        self.pstbln_facial_expression_classifier.topology = [2]
+        self.pstbln_facial_expression_classifier.load(path=os.path.join(self.temp_dir, self.experiment_name),
+                                                      model_name='grown_model')
+        model = self.pstbln_facial_expression_classifier.model
+        self.assertTrue(torch.equal(model.layers['l0'].bln.g_conv[0].weight, saved_conv),
+                        msg="Grown conv weights did not round-trip through save/load.")
+        self.assertTrue(torch.equal(model.fc.weight, saved_fc),
+                        msg="Grown classifier weights did not round-trip through save/load.")
+        # Cleanup
+        rmdir(os.path.join(self.temp_dir, self.experiment_name))
+
     def test_optimize(self):
         self.pstbln_facial_expression_classifier.topology = [1]
         self.pstbln_facial_expression_classifier.ort_session = None